@@ -0,0 +1,299 @@
+#! /usr/bin/env python
+'''
+microbenchmarks comparing ImmutableModel hot paths with a plain django Model
+
+    $ python benchmarks.py                           # table of results
+    $ python benchmarks.py --json results.json       # ... also saved as json
+    $ python benchmarks.py --compare results.json    # fail if slower than then
+
+Results are compared by their ratio to the plain Model, which depends much
+less on the machine running them than the times themselves.
+'''
+import argparse
+import itertools
+import json
+import os
+import pickle
+import platform
+import sys
+import threading
+import timeit
+from collections import OrderedDict
+
+ROOT = os.path.abspath(os.path.dirname(__file__))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'samples')]
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'test_settings')
+
+import django
+if hasattr(django, 'setup'):
+    django.setup()
+from django.apps.registry import Apps
+from django.contrib import admin
+from django.core.management import call_command
+from django.db import connection, models, transaction
+from django.test.client import RequestFactory
+
+from immutablemodel.admin import ImmutableModelAdmin
+from immutablemodel.models import ImmutableModel
+from tests.testapp.models import ComplexLockField, PlainLockField
+
+NUMBER = 100000
+REPEAT = 3
+
+ROWS = 10000
+
+# a ratio this much worse than the one compared with counts as a regression
+THRESHOLD = 1.25
+
+
+def best_of(stmt, number=NUMBER, setup='pass'):
+    return min(timeit.repeat(stmt, setup=setup, number=number, repeat=REPEAT)) / number
+
+
+def locked(model):
+    return model(id=1, is_locked=True, special_id=1, name='Yoda')
+
+
+def saved(model):
+    obj = model.objects.filter(is_locked=True).first()
+    if obj is None:
+        obj = model.objects.create(is_locked=True, special_id=1, name='Yoda')
+    return obj
+
+
+def bench_construct(model):
+    return best_of(lambda: locked(model))
+
+
+def bench_setattr(model, name, value):
+    obj = locked(model)
+    return best_of(lambda: setattr(obj, name, value))
+
+
+def fill(model):
+    if model.objects.count() < ROWS:
+        model.objects.bulk_create(
+            [model(is_locked=True, special_id=i, name='Yoda') for i in range(ROWS)]
+        )
+
+
+def bench_iterate(model):
+    fill(model)
+    return best_of(lambda: list(model.objects.all()[:ROWS]), number=10) / ROWS
+
+
+def bench_save(model):
+    obj = saved(model)
+    names = itertools.cycle(['Obi-Wan', 'Yoda'])
+
+    def save():
+        obj.name = next(names)
+        obj.save()
+    return best_of(save, number=1000)
+
+
+def bench_delete(model):
+    # each repeat deletes its own rows, created beforehand
+    objs = []
+
+    def setup():
+        model.objects.bulk_create([model(is_locked=False, special_id=i, name='Yoda') for i in range(1000)])
+        objs[:] = model.objects.filter(is_locked=False)
+    return best_of(lambda: objs.pop().delete(), number=1000, setup=setup)
+
+
+def bench_pickle(model):
+    obj = locked(model)
+    return best_of(lambda: pickle.loads(pickle.dumps(obj, pickle.HIGHEST_PROTOCOL)), number=NUMBER // 10)
+
+
+_class_names = ('BenchmarkModel%d' % i for i in itertools.count())
+
+# models defined by the startup benchmark
+MODELS = 200
+
+
+def define_model(base, registry):
+    class Meta:
+        app_label = 'testapp'
+        apps = registry
+    if base is ImmutableModel:
+        Meta.immutable_fields = ['special_id']
+        Meta.immutable_lock_field = 'is_locked'
+    return type(next(_class_names), (base,), {
+        '__module__': __name__,
+        'Meta': Meta,
+        'is_locked': models.BooleanField(default=True),
+        'special_id': models.IntegerField(),
+        'name': models.CharField(max_length=50),
+    })
+
+
+def bench_startup(model, n=MODELS):
+    """per model, defining n models (in a registry of their own, as the cost of
+    registering a model grows with the number already registered)"""
+    base = ImmutableModel if issubclass(model, ImmutableModel) else models.Model
+
+    def define():
+        registry = Apps()
+        for i in range(n):
+            define_model(base, registry)
+    return best_of(define, number=1) / n
+
+
+def bench_readonly_fields(model):
+    model_admin = (ImmutableModelAdmin if issubclass(model, ImmutableModel) else admin.ModelAdmin)(model, admin.site)
+    obj = saved(model)
+    factory = RequestFactory()
+    # a new request each time: the lock state is fetched once per request
+    return best_of(lambda: model_admin.get_readonly_fields(factory.get('/'), obj), number=1000)
+
+
+BENCHMARKS = [
+    ('construct', bench_construct),
+    ('setattr mutable field', lambda model: bench_setattr(model, 'name', 'Obi-Wan')),
+    ('setattr immutable field', lambda model: bench_setattr(model, 'special_id', 1)),
+    ('setattr private attribute', lambda model: bench_setattr(model, '_private', 1)),
+    ('iterate queryset (per row)', bench_iterate),
+    ('save mutable change', bench_save),
+    ('delete', bench_delete),
+    ('pickle + unpickle', bench_pickle),
+    ('define model class (startup)', bench_startup),
+    ('admin get_readonly_fields', bench_readonly_fields),
+]
+
+
+def instance_size(obj):
+    size = sys.getsizeof(obj)
+    for part in (obj, obj._state):
+        size += sys.getsizeof(part.__dict__) + (sys.getsizeof(part) if part is not obj else 0)
+    return size
+
+
+def pickled_size(model):
+    return len(pickle.dumps(locked(model), pickle.HIGHEST_PROTOCOL))
+
+
+def compare_frozen(model):
+    """rows of model as instances and as frozen() tuples: per row time and size"""
+    fill(model)
+    instances = best_of(lambda: list(model.objects.all()[:ROWS]), number=10) / ROWS
+    frozen = best_of(lambda: list(model.objects.all()[:ROWS].frozen()), number=10) / ROWS
+    print_ln("%-28s %12.3f %12.3f %8.2f" % ("iterate (per row)", instances * 1e6, frozen * 1e6, frozen / instances))
+    instances = instance_size(model.objects.all()[0])
+    frozen = sys.getsizeof(next(model.objects.frozen()))
+    print_ln("%-28s %12d %12d %8.2f" % ("size (bytes per row)", instances, frozen, float(frozen) / instances))
+
+
+# threads saving changes to the same few rows, and saves each makes
+WRITERS = 8
+WRITER_ROWS = 2
+SAVES = 200
+
+
+def compare_conditional_save(model, writers=WRITERS, rows=WRITER_ROWS, saves=SAVES):
+    """saves per second of writers threads changing the same unlocked rows, as
+    is (a conditional UPDATE) and guarded with select_for_update in a
+    transaction - only where the database has row locks to contend for"""
+    if not connection.features.has_select_for_update:
+        print_ln("%-28s skipped: %s has no row locks" % ("concurrent saves", connection.vendor))
+        return
+    pks = [model.objects.create(is_locked=False, special_id=1, name='Yoda').pk for _ in range(rows)]
+
+    def optimistic(pk):
+        obj = model.objects.get(pk=pk)
+        for special_id in range(saves):
+            obj.special_id = special_id
+            obj.save()
+
+    def pessimistic(pk):
+        for special_id in range(saves):
+            with transaction.atomic():
+                obj = model.objects.select_for_update().get(pk=pk)
+                if not obj.is_locked:
+                    obj.special_id = special_id
+                    obj.save()
+
+    def throughput(write):
+        def writer(pk):
+            try:
+                write(pk)
+            finally:
+                connection.close()
+        threads = [threading.Thread(target=writer, args=(pks[i % rows],)) for i in range(writers)]
+        start = timeit.default_timer()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return writers * saves / (timeit.default_timer() - start)
+    optimistic, pessimistic = throughput(optimistic), throughput(pessimistic)
+    print_ln("%-28s %12.0f %12.0f %8.2f" % ("concurrent saves (per s)", optimistic, pessimistic,
+                                             optimistic / pessimistic))
+
+
+def run():
+    results = OrderedDict()
+    for name, bench in BENCHMARKS:
+        plain = bench(PlainLockField)
+        immutable = bench(ComplexLockField)
+        results[name] = OrderedDict([('plain', plain), ('immutable', immutable), ('ratio', immutable / plain)])
+        print_ln("%-28s %12.3f %12.3f %8.2f" % (name, plain * 1e6, immutable * 1e6, immutable / plain))
+    return results
+
+
+def regressions(results, baseline, threshold=THRESHOLD):
+    """(name, was, now) for each benchmark whose ratio got more than threshold times worse"""
+    found = []
+    for name, result in results.items():
+        if name in baseline and result['ratio'] > baseline[name]['ratio'] * threshold:
+            found.append((name, baseline[name]['ratio'], result['ratio']))
+    return found
+
+
+def print_ln(msg):
+    sys.stdout.write(msg)
+    sys.stdout.write("\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--json', metavar='FILE', help='save the results to FILE')
+    parser.add_argument('--compare', metavar='FILE', help='compare with results saved by --json')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                        help='how many times worse a ratio can get before it fails --compare (default %s)' % THRESHOLD)
+    options = parser.parse_args(argv)
+
+    call_command('migrate' if django.VERSION >= (1, 7) else 'syncdb', interactive=False, verbosity=0)
+    print_ln("%-28s %12s %12s %8s" % ("benchmark", "plain (us)", "immutable (us)", "ratio"))
+    results = run()
+    plain, immutable = pickled_size(PlainLockField), pickled_size(ComplexLockField)
+    print_ln("%-28s %12d %12d %8.2f" % ("pickled size (bytes)", plain, immutable, float(immutable) / plain))
+    print_ln("")
+    print_ln("%-28s %12s %12s %8s" % ("", "instances", "frozen()", "ratio"))
+    compare_frozen(ComplexLockField)
+    print_ln("")
+    print_ln("%-28s %12s %12s %8s" % ("", "save", "for update", "ratio"))
+    compare_conditional_save(ComplexLockField)
+
+    if options.json:
+        with open(options.json, 'w') as f:
+            json.dump(OrderedDict([
+                ('python', platform.python_version()),
+                ('django', django.get_version()),
+                ('results', results),
+            ]), f, indent=2)
+    if options.compare:
+        with open(options.compare) as f:
+            baseline = json.load(f)['results']
+        found = regressions(results, baseline, options.threshold)
+        print_ln("")
+        for name, was, now in found:
+            print_ln("REGRESSION %-28s ratio %.2f -> %.2f" % (name, was, now))
+        if found:
+            return 1
+        print_ln("no regressions against %s" % options.compare)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,5 +6,6 @@ Copyright:
 Please see LICENSE and AUTHORS for more information.
 """
 
-from .models import ImmutableModel, CantDeleteImmutableException, PK_FIELD, UNDEFINED
+from .models import ImmutableModel, CantDeleteImmutableException, PK_FIELD, UNDEFINED, immutable_cached_property
+from .query import ImmutableQuerySet, ImmutableManager
 from .admin import ImmutableModelAdmin
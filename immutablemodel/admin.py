@@ -1,24 +1,65 @@
 # encoding: utf-8
 from django.contrib import admin
+from django.contrib.admin.utils import model_ngettext
+from django.core.exceptions import FieldDoesNotExist
+
+from .query import bulk_lock_field, lock
 
 class ImmutableModelAdmin(admin.ModelAdmin):
+    actions = ['lock_selected']
+
+    def lock_selected(self, request, queryset):
+        count = lock(queryset)
+        self.message_user(request, "Locked %d %s." % (count, model_ngettext(self.opts, count)))
+    lock_selected.short_description = "Lock selected %(verbose_name_plural)s"
+
+    def get_actions(self, request):
+        actions = super(ImmutableModelAdmin, self).get_actions(request)
+        if 'lock_selected' in actions:
+            try:
+                bulk_lock_field(self.model)
+            except TypeError:
+                del actions['lock_selected']
+        return actions
+
+    def is_locked_in_db(self, request, obj):
+        """
+        Whether obj is locked in the database: fetched once per request, as
+        django asks for the readonly fields (etc.) several times per page.
+        """
+        lock_states = request.__dict__.setdefault('_immutable_lock_states', {})
+        key = (obj._meta.concrete_model, obj.pk)
+        if key not in lock_states:
+            lock_states[key] = self.get_lock_state(obj)
+        return lock_states[key]
+
+    def get_lock_state(self, obj):
+        immutable_lock_field_name = obj._meta.immutable_lock_field
+        if immutable_lock_field_name is None:
+            return True
+        manager = obj._meta.concrete_model._default_manager
+        try:
+            obj._meta.get_field(immutable_lock_field_name)
+        except FieldDoesNotExist:
+            # eg. a property: need the whole object
+            return bool(getattr(manager.get(pk=obj.pk), immutable_lock_field_name, False))
+        return bool(manager.filter(pk=obj.pk).values_list(immutable_lock_field_name, flat=True).first())
+
     def get_readonly_fields(self, request, obj=None):
         # Override super class method, in order to achieve readonly fields, at
         # signed-off entities forms
-        def reload_obj():
-            return obj.__class__.objects.get(pk=obj.pk)
-
         if not obj is None:
             # We'r chaging the obj
             immutable_lock_field_name = obj._meta.immutable_lock_field
-            if not getattr(reload_obj(), immutable_lock_field_name, False):
+            if not self.is_locked_in_db(request, obj):
                 return self.readonly_fields + tuple([immutable_lock_field_name])
             return self.readonly_fields + tuple(obj._meta.immutable_admin_fields)
         else:
             return self.readonly_fields
 
     def has_delete_permission(self, request, obj=None):
-        if not obj.immutable_is_deletable and obj.is_immutable():
+        if (obj is not None and not obj._meta.immutable_is_deletable and
+                self.is_locked_in_db(request, obj)):
             return False
         return super(ImmutableModelAdmin, self).has_delete_permission(
             request,
@@ -39,7 +80,7 @@ class ComplexImmutableModelAdmin(ImmutableModelAdmin):
             obj.save()
 
     def render_change_form(self, request, context, add=False, change=False, form_url='', obj=None):
-        if not obj is None and obj.is_immutable():
+        if not obj is None and self.is_locked_in_db(request, obj):
             context['adminform'].form.fields['immutable_lock'].widget.attrs['disabled'] = True
 
         return super(ComplexImmutableModelAdmin, self).render_change_form(
@@ -51,54 +92,46 @@ class ComplexImmutableModelAdmin(ImmutableModelAdmin):
             obj,
         )
 
-    def change_view(self, request, object_id, extra_context=None):
-        if extra_context is None:
-            extra_context = {}
-
-        obj = self.get_object(request, int(object_id))
-
+    def change_view(self, request, object_id, form_url='', extra_context=None):
         # Overriding the "_saveasnew" particular case, for readonly fields
         # treatment purposes
         if '_saveasnew' in request.POST:
+            obj = self.get_object(request, int(object_id))
             request.method = 'GET'
             try:
                 immutable_lock_field_name = obj._meta.immutable_lock_field
             except AttributeError:
                 immutable_lock_field_name = ""
 
-            fields_dict = {}
-            fields_dict.update(
-                dict([
-                    (field.name, field._get_val_from_obj(obj))
-                    for field in obj._meta.fields
-                    if field.name != immutable_lock_field_name
-                ])
+            initial = dict([
+                (field.name, field._get_val_from_obj(obj))
+                for field in obj._meta.fields
+                if field.name != immutable_lock_field_name
+            ])
+
+            # just the primary keys, without building the related objects
+            initial.update(
+                (field.name, list(getattr(obj, field.name).values_list('pk', flat=True).iterator()))
+                for field in obj._meta.many_to_many
+                if field.name != immutable_lock_field_name
             )
 
-            fields_dict.update(
-                dict((
-                    field.name,
-                    ",".join([
-                        str(s.pk) for s in
-                        getattr(obj, field.name).all()
-                    ]),)
-                    for field in (_f for _f in obj._meta.many_to_many)
-                    if field.name != immutable_lock_field_name
-                )
-            )
-
-            request_get_copy = request.GET.copy()
-            request_get_copy.update(fields_dict)
-            request.GET = request_get_copy
+            # handed straight to the add form (see get_changeform_initial_data)
+            request._immutable_saveasnew_initial = initial
 
             return self.add_view(request, form_url='../add/')
 
         return super(ComplexImmutableModelAdmin, self).change_view(
             request,
             object_id,
+            form_url,
             extra_context,
         )
 
+    def get_changeform_initial_data(self, request):
+        initial = super(ComplexImmutableModelAdmin, self).get_changeform_initial_data(request)
+        initial.update(getattr(request, '_immutable_saveasnew_initial', {}))
+        return initial
 
     def response_change(self, request, obj):
         response = super(ComplexImmutableModelAdmin, self).response_change(request,obj)
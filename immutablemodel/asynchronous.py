@@ -0,0 +1,64 @@
+# encoding: utf-8
+"""
+Awaitable versions of the ImmutableModel operations (asave, adelete, ...).
+
+This django has no async ORM, so they run the usual, synchronous methods -
+and so the same immutability rules - in threads kept for this, rather than
+blocking the event loop. By default there's one such thread, so the
+database work of all of them is done in order, one call at a time:
+IMMUTABLE_ASYNC_WORKERS sets how many there are. As each thread has its own
+database connection, the work isn't part of any transaction the caller has
+open. Like a request, each call starts and ends by closing the thread's
+connection if it's broken or older than CONN_MAX_AGE.
+"""
+import functools
+import threading
+
+_executor = None
+_executor_lock = threading.Lock()
+
+# the threads doing the database work, unless IMMUTABLE_ASYNC_WORKERS says otherwise
+DEFAULT_WORKERS = 1
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            from django.conf import settings
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'IMMUTABLE_ASYNC_WORKERS', DEFAULT_WORKERS))
+        return _executor
+
+
+def _call(func, args, kwargs):
+    from django.db import close_old_connections
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+def _running_loop():
+    import asyncio
+    # (get_event_loop gives the running loop too, before python 3.7)
+    return getattr(asyncio, 'get_running_loop', asyncio.get_event_loop)()
+
+
+class InThread(object):
+    """
+    Awaitable func(*args, **kwargs), called in one of the database threads
+    once it's awaited (on the loop awaiting it)
+    """
+    def __init__(self, func, args, kwargs):
+        self.call = functools.partial(_call, func, args, kwargs)
+
+    def __await__(self):
+        return _running_loop().run_in_executor(get_executor(), self.call).__await__()
+
+
+def run_in_thread(func, *args, **kwargs):
+    """An awaitable for func(*args, **kwargs), called in a database thread"""
+    return InThread(func, args, kwargs)
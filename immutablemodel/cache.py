@@ -0,0 +1,244 @@
+# encoding: utf-8
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_SIZE = 1000
+
+# bump when the layout of the values kept in the shared cache changes
+KEY_VERSION = 2
+
+
+class InstanceCache(object):
+    """
+    A bounded, least recently used map from (model, database, primary key) to
+    the field values of a locked instance (see the immutable_cache_instances
+    option). Each lookup builds a new instance from the values, so nothing
+    done to one instance is seen by the next.
+    """
+    def __init__(self, size=None):
+        self.size = size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def get_size(self):
+        if self.size is not None:
+            return self.size
+        from django.conf import settings
+        return getattr(settings, 'IMMUTABLE_CACHE_SIZE', DEFAULT_SIZE)
+
+    @staticmethod
+    def attnames(model):
+        return [f.attname for f in model._meta.concrete_fields]
+
+    def get(self, model, db, pk):
+        """A new instance of model built from the cached values, or None"""
+        key = (model._meta.concrete_model, db, pk)
+        with self._lock:
+            values = self._entries.pop(key, None)
+            if values is None:
+                self.misses += 1
+                return None
+            self._entries[key] = values
+            self.hits += 1
+        return model.from_db(db, self.attnames(model), values)
+
+    def put(self, instance, db, values):
+        size = self.get_size()
+        if size <= 0:
+            return
+        key = (instance._meta.concrete_model, db, instance.pk)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = tuple(values)
+            while len(self._entries) > size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, model, db=None, pk=None):
+        """Forget an instance of model, or all of them when pk is None"""
+        concrete_model = model._meta.concrete_model
+        with self._lock:
+            if db is not None and pk is not None:
+                self._entries.pop((concrete_model, db, pk), None)
+                return
+            for key in list(self._entries):
+                if key[0] is concrete_model and (pk is None or key[2] == pk):
+                    del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self._entries),
+        }
+
+
+class SharedInstanceCache(object):
+    """
+    The field values of locked instances, kept in a django cache (named by
+    the IMMUTABLE_CACHE_ALIAS setting) so that every process can use them.
+
+    The keys include the model's field layout. Each entry is kept with the
+    generation of the model it was stored in, which invalidating all of a
+    model's rows moves on: entries of any other generation are ignored (and
+    a lost generation starts again from the current time, so old entries
+    don't match it). The generation is fetched along with the entries, so
+    a lookup is one round trip to the cache.
+    """
+    def __init__(self, alias=None):
+        self.alias = alias
+        self._prefixes = {}
+
+    def get_cache(self):
+        """The django cache to use, or None when there isn't one"""
+        alias = self.alias
+        if alias is None:
+            from django.conf import settings
+            alias = getattr(settings, 'IMMUTABLE_CACHE_ALIAS', None)
+            if alias is None:
+                return None
+        from django.core.cache import caches
+        return caches[alias]
+
+    def prefix(self, model):
+        model = model._meta.concrete_model
+        try:
+            return self._prefixes[model]
+        except KeyError:
+            layout = ','.join(InstanceCache.attnames(model)).encode('utf-8')
+            prefix = 'immutablemodel:%d:%s.%s:%s' % (
+                KEY_VERSION, model._meta.app_label, model._meta.model_name, hashlib.md5(layout).hexdigest()[:8])
+            self._prefixes[model] = prefix
+            return prefix
+
+    def generation_key(self, model):
+        return '%s:generation' % self.prefix(model)
+
+    def generation(self, cache, model):
+        """The current generation of model, started if there's none"""
+        generation_key = self.generation_key(model)
+        generation = cache.get(generation_key)
+        if generation is None:
+            cache.add(generation_key, self.new_generation(), None)
+            generation = cache.get(generation_key)
+        return generation
+
+    def keys(self, model, db, pks):
+        prefix = self.prefix(model)
+        return dict(('%s:%s:%s' % (prefix, db, pk), pk) for pk in pks)
+
+    def get_many(self, model, db, pks):
+        """The cached values of those of pks that are in the cache, by primary key"""
+        cache = self.get_cache()
+        if cache is None or not pks:
+            return {}
+        keys = self.keys(model, db, pks)
+        generation_key = self.generation_key(model)
+        found = cache.get_many([generation_key] + list(keys))
+        generation = found.pop(generation_key, None)
+        if generation is None:
+            # lost (or never started): nothing stored can be of the next one
+            return {}
+        return dict((keys[key], values) for key, (stored_in, values) in found.items() if stored_in == generation)
+
+    def set_many(self, instances):
+        cache = self.get_cache()
+        if cache is None or not instances:
+            return
+        model, db = instances[0]._meta.concrete_model, instances[0]._state.db
+        attnames = InstanceCache.attnames(model)
+        generation = self.generation(cache, model)
+        keys = self.keys(model, db, [obj.pk for obj in instances])
+        values = dict((obj.pk, tuple(obj.__dict__[attname] for attname in attnames)) for obj in instances)
+        cache.set_many(dict((key, (generation, values[pk])) for key, pk in keys.items()))
+
+    def invalidate(self, model, db=None, pk=None):
+        cache = self.get_cache()
+        if cache is None:
+            return
+        if db is not None and pk is not None:
+            cache.delete_many(list(self.keys(model, db, [pk])))
+            return
+        generation_key = self.generation_key(model)
+        try:
+            cache.incr(generation_key)
+        except ValueError:
+            cache.add(generation_key, self.new_generation(), None)
+
+    @staticmethod
+    def new_generation():
+        return int(time.time() * 1000)
+
+
+instance_cache = InstanceCache()
+shared_cache = SharedInstanceCache()
+
+
+def get_many(model, db, pks):
+    """
+    Instances of the locked rows among pks that either cache has, by primary
+    key: those found in the shared cache are then kept by this process too.
+    """
+    found = {}
+    for pk in pks:
+        obj = instance_cache.get(model, db, pk)
+        if obj is not None:
+            found[pk] = obj
+    missing = [pk for pk in pks if pk not in found]
+    shared = shared_cache.get_many(model, db, missing)
+    if not shared:
+        return found
+    attnames = InstanceCache.attnames(model)
+    from django.conf import settings
+    if getattr(settings, 'IMMUTABLE_CACHE_REFETCH_MUTABLE', False):
+        shared = refetch_mutable(model, db, shared)
+    for pk, values in shared.items():
+        obj = model.from_db(db, attnames, values)
+        if obj.is_immutable():
+            found[pk] = obj
+    return found
+
+
+def refetch_mutable(model, db, shared):
+    """shared, with the fields that can still change read from the database"""
+    opts = model._meta.concrete_model._meta
+    refreshed = opts.immutable_refreshed_attnames
+    if not refreshed:
+        return shared
+    attnames = InstanceCache.attnames(model)
+    positions = [attnames.index(attname) for attname in refreshed]
+    rows = model._base_manager.using(db).filter(pk__in=list(shared)).values_list('pk', *refreshed)
+    current = {}
+    for row in rows:
+        values = list(shared[row[0]])
+        for position, value in zip(positions, row[1:]):
+            values[position] = value
+        current[row[0]] = tuple(values)
+    return current
+
+
+def remember(instances):
+    """
+    Share the locked ones of instances (all of the same model and database)
+    with other processes - unless read in a transaction, which may yet be
+    rolled back.
+    """
+    from django.db import connections
+    instances = [obj for obj in instances if obj.is_immutable()]
+    if instances and not connections[instances[0]._state.db].in_atomic_block:
+        shared_cache.set_many(instances)
+
+
+def invalidate(model, db=None, pk=None):
+    """Forget an instance of model, or all of them when pk is None, in both caches"""
+    instance_cache.invalidate(model, db, pk)
+    shared_cache.invalidate(model, db, pk)
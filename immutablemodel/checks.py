@@ -0,0 +1,76 @@
+# encoding: utf-8
+from django.core import checks
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+from django.utils import six
+
+BOOLEAN_OPTIONS = (
+    'immutable_quiet',
+    'immutable_is_deletable',
+    'immutable_descriptors',
+    'immutable_python_guard',
+    'immutable_cache_instances',
+)
+
+
+def check_immutable_options(model):
+    """
+    The system check errors (and warnings) for model's immutability options:
+    see ImmutableModel.check.
+    """
+    from .models import UNDEFINED
+    opts = model._meta
+    declared = opts.immutable_meta_options
+    errors = []
+    for opt_name in ('immutable_fields', 'mutable_fields'):
+        names = declared[opt_name]
+        if names is UNDEFINED:
+            names = getattr(opts, opt_name)
+        if not isinstance(names, (list, tuple)):
+            errors.append(checks.Error(
+                '%s must be a list (or tuple).' % opt_name,
+                hint=None, obj=model, id='immutablemodel.E001'))
+            continue
+        for name in names:
+            try:
+                opts.get_field(name)
+            except FieldDoesNotExist:
+                errors.append(checks.Warning(
+                    "%s refers to '%s', which isn't a field." % (opt_name, name),
+                    hint=None, obj=model, id='immutablemodel.W001'))
+    if declared['immutable_fields'] and declared['mutable_fields']:
+        errors.append(checks.Error(
+            'You can specify either mutable_fields OR immutable_fields (not both).',
+            hint=None, obj=model, id='immutablemodel.E002'))
+
+    lock_field = opts.immutable_lock_field
+    if lock_field is not None and not isinstance(lock_field, six.string_types):
+        errors.append(checks.Error(
+            'immutable_lock_field must be a string (or None, or omitted).',
+            hint=None, obj=model, id='immutablemodel.E003'))
+    elif lock_field is not None and not hasattr(model, lock_field):
+        try:
+            opts.get_field(lock_field)
+        except FieldDoesNotExist:
+            errors.append(checks.Error(
+                "immutable_lock_field refers to '%s', which isn't a field or attribute." % lock_field,
+                hint=None, obj=model, id='immutablemodel.E004'))
+
+    fingerprint_field = opts.immutable_fingerprint_field
+    if fingerprint_field is not None:
+        from .fingerprint import FINGERPRINT_LENGTH
+        try:
+            field = opts.get_field(fingerprint_field)
+        except (FieldDoesNotExist, TypeError):
+            field = None
+        if not isinstance(field, models.CharField) or field.max_length < FINGERPRINT_LENGTH:
+            errors.append(checks.Error(
+                'immutable_fingerprint_field must name a CharField with a max_length of at least %d.'
+                % FINGERPRINT_LENGTH, hint=None, obj=model, id='immutablemodel.E006'))
+
+    for opt_name in BOOLEAN_OPTIONS:
+        if not isinstance(getattr(opts, opt_name), bool):
+            errors.append(checks.Error(
+                '%s must be boolean.' % opt_name,
+                hint=None, obj=model, id='immutablemodel.E005'))
+    return errors
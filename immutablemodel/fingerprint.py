@@ -0,0 +1,64 @@
+# encoding: utf-8
+"""
+The fingerprint of an immutable instance: a sha1 (as 40 hex digits) of its
+model and the values of its immutable fields - other than the primary key,
+the lock field and the field the fingerprint is kept in - which can't change
+once it's locked. See ImmutableModel.immutable_fingerprint.
+"""
+import datetime
+import hashlib
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import models
+from django.db.backends.utils import format_number
+from django.utils import timezone
+from django.utils.encoding import force_bytes
+
+FINGERPRINT_LENGTH = 40
+
+
+def fingerprinted_fields(model):
+    opts = model._meta
+    left_out = (opts.immutable_lock_field, opts.immutable_fingerprint_field)
+    return tuple(f for f in opts.concrete_fields
+                 if f.attname not in opts.immutable_mutable_names and not f.primary_key and f.name not in left_out)
+
+
+def _normalized(field, value):
+    """
+    value as the database gives it back, so that the values assigned to an
+    instance and those read from its row are fingerprinted alike
+    """
+    try:
+        value = field.to_python(value)
+    except ValidationError:
+        # left to save() to complain about
+        return field.get_prep_value(value)
+    if isinstance(field, models.DecimalField):
+        # with the field's decimal places: Decimal('1.1') is stored as 1.10
+        return format_number(value, field.max_digits, field.decimal_places)
+    if isinstance(value, datetime.datetime):
+        if settings.USE_TZ and timezone.is_naive(value):
+            # as the database takes it (with a warning from django)
+            value = timezone.make_aware(value, timezone.get_default_timezone())
+        if timezone.is_aware(value):
+            # in UTC, whatever time zone it was given in
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value.isoformat()
+    return field.get_prep_value(value)
+
+
+def fingerprint(model, values):
+    """The fingerprint of a row of model, given the values of its fingerprinted fields (in order)"""
+    opts = model._meta.concrete_model._meta
+    digest = hashlib.sha1(force_bytes('%s.%s' % (opts.app_label, opts.object_name)))
+    for field, value in zip(opts.immutable_fingerprinted_fields, values):
+        if value is None:
+            digest.update(b'\0')
+            continue
+        data = force_bytes(_normalized(field, value))
+        # the length first, so that no two lists of values run together alike
+        digest.update(force_bytes('\1%d:' % len(data)))
+        digest.update(data)
+    return digest.hexdigest()
@@ -0,0 +1,70 @@
+# encoding: utf-8
+from operator import itemgetter
+
+from django.apps import apps
+from django.db import router
+
+_frozen_classes = {}
+
+
+class FrozenInstance(tuple):
+    """
+    The field values of one row, read only: a tuple in the order of the
+    model's concrete fields, with an attribute for each field (by attname).
+
+    See ImmutableQuerySet.frozen.
+    """
+    __slots__ = ()
+
+    _model = None
+    _fields = ()
+
+    def __eq__(self, other):
+        return (isinstance(other, FrozenInstance) and
+                self._model._meta.concrete_model is other._model._meta.concrete_model and
+                tuple.__eq__(self, other))
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((self._model._meta.concrete_model, tuple(self)))
+
+    def __repr__(self):
+        return '<Frozen%s: %s>' % (self._model.__name__, ', '.join(
+            '%s=%r' % pair for pair in zip(self._fields, self)))
+
+    def __reduce__(self):
+        opts = self._model._meta
+        return (_unpickle_frozen, (opts.app_label, opts.object_name, tuple(self)))
+
+    def to_instance(self, using=None):
+        """The model instance for the row, as if loaded from database using"""
+        if using is None:
+            using = router.db_for_read(self._model)
+        return self._model.from_db(using, self._fields, self)
+
+
+def frozen_class(model):
+    """The FrozenInstance subclass for model, made the first time it's asked for"""
+    try:
+        return _frozen_classes[model]
+    except KeyError:
+        pass
+    fields = tuple(f.attname for f in model._meta.concrete_fields)
+    attrs = {
+        '__slots__': (),
+        '__module__': model.__module__,
+        '_model': model,
+        '_fields': fields,
+        'pk': property(itemgetter(fields.index(model._meta.pk.attname))),
+    }
+    for index, attname in enumerate(fields):
+        attrs[attname] = property(itemgetter(index))
+    klass = type(str('Frozen%s' % model.__name__), (FrozenInstance,), attrs)
+    _frozen_classes[model] = klass
+    return klass
+
+
+def _unpickle_frozen(app_label, object_name, values):
+    return frozen_class(apps.get_model(app_label, object_name))(values)
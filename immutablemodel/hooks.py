@@ -0,0 +1,44 @@
+# encoding: utf-8
+"""
+Wrappers around methods of ImmutableModel (and ImmutableModelAdmin), which
+instrumentation and profiling add and remove in any order: each method is
+rebuilt from the original and the wrappers still added, so removing one
+never takes away (or puts back) another's.
+"""
+import threading
+
+_lock = threading.Lock()
+_originals = {}
+_wrappers = {}
+
+
+def _install(klass, name):
+    method = _originals[(klass, name)]
+    for wrapper in _wrappers[(klass, name)]:
+        method = wrapper(method)
+    setattr(klass, name, method)
+
+
+def add(klass, name, wrapper):
+    """Replace klass.name with wrapper(method), around any wrappers already added"""
+    with _lock:
+        key = (klass, name)
+        if key not in _originals:
+            _originals[key] = klass.__dict__[name]
+            _wrappers[key] = []
+        _wrappers[key].append(wrapper)
+        _install(klass, name)
+
+
+def remove(klass, name, wrapper):
+    """Take wrapper (added to klass.name) away, if it's there"""
+    with _lock:
+        key = (klass, name)
+        if wrapper not in _wrappers.get(key, ()):
+            return
+        _wrappers[key].remove(wrapper)
+        if _wrappers[key]:
+            _install(klass, name)
+        else:
+            setattr(klass, name, _originals.pop(key))
+            del _wrappers[key]
@@ -0,0 +1,109 @@
+# encoding: utf-8
+"""
+Per-model counters of what the immutability guard does:
+
+guard_calls
+    writes checked by can_change_field
+blocked_writes, blocked_deletes
+    changes to immutable fields, and deletes, that were refused
+guard_queries
+    database queries made while checking a write (eg. to load a deferred
+    lock field)
+
+Nothing is counted (or costs anything) until enable() is called: it wraps
+the methods involved (see immutablemodel.hooks), and disable() takes the
+wrappers away again.
+"""
+import threading
+from collections import defaultdict
+
+from . import hooks
+from .models import ImmutableModel
+from .signals import immutable_write_blocked, immutable_delete_blocked
+
+COUNTERS = ('guard_calls', 'blocked_writes', 'blocked_deletes', 'guard_queries')
+
+_counts = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+_lock = threading.Lock()
+_local = threading.local()
+_enabled = False
+
+
+def _count(model, counter):
+    with _lock:
+        _counts[model._meta.concrete_model][counter] += 1
+
+
+def _counting_can_change_field(original):
+    def can_change_field(self, field_name):
+        _count(self.__class__, 'guard_calls')
+        _local.checking = getattr(_local, 'checking', 0) + 1
+        try:
+            return original(self, field_name)
+        finally:
+            _local.checking -= 1
+    return can_change_field
+
+
+def _counting_refresh_from_db(original):
+    def refresh_from_db(self, *args, **kwargs):
+        if getattr(_local, 'checking', 0):
+            _count(self.__class__, 'guard_queries')
+        return original(self, *args, **kwargs)
+    return refresh_from_db
+
+
+def _count_blocked_write(sender, **kwargs):
+    _count(sender, 'blocked_writes')
+
+
+def _count_blocked_delete(sender, **kwargs):
+    _count(sender, 'blocked_deletes')
+
+
+WRAPPERS = (
+    ('can_change_field', _counting_can_change_field),
+    ('refresh_from_db', _counting_refresh_from_db),
+)
+
+
+def is_enabled():
+    return _enabled
+
+
+def enable():
+    global _enabled
+    with _lock:
+        if _enabled:
+            return
+        _enabled = True
+    for name, wrapper in WRAPPERS:
+        hooks.add(ImmutableModel, name, wrapper)
+    immutable_write_blocked.connect(_count_blocked_write)
+    immutable_delete_blocked.connect(_count_blocked_delete)
+
+
+def disable():
+    global _enabled
+    with _lock:
+        _enabled = False
+    for name, wrapper in WRAPPERS:
+        hooks.remove(ImmutableModel, name, wrapper)
+    immutable_write_blocked.disconnect(_count_blocked_write)
+    immutable_delete_blocked.disconnect(_count_blocked_delete)
+
+
+def counters(model=None):
+    """
+    The counts for model (or a dict of them for every model, when None)
+    since they were last reset.
+    """
+    with _lock:
+        if model is not None:
+            return dict(_counts.get(model._meta.concrete_model) or dict.fromkeys(COUNTERS, 0))
+        return dict((model, dict(counts)) for model, counts in _counts.items())
+
+
+def reset():
+    with _lock:
+        _counts.clear()
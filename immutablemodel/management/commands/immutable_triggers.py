@@ -0,0 +1,65 @@
+# encoding: utf-8
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from immutablemodel.models import ImmutableModel
+from immutablemodel.operations import CreateImmutableTriggers, DropImmutableTriggers
+from immutablemodel.triggers import create_trigger_sql, drop_trigger_sql
+
+
+class Command(BaseCommand):
+    help = ("Prints (or, with --execute, runs) the SQL creating database triggers "
+            "which enforce the immutability options of ImmutableModels.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('models', nargs='*', metavar='app_label[.ModelName]',
+            help='Restricts the triggers to these apps or models (default: all ImmutableModels).')
+        parser.add_argument('--drop', action='store_true', dest='drop', default=False,
+            help='Drop the triggers instead of creating them.')
+        parser.add_argument('--execute', action='store_true', dest='execute', default=False,
+            help='Run the statements rather than print them.')
+        parser.add_argument('--migration', action='store_true', dest='migration', default=False,
+            help='Print migration operations keeping the options as they are now, rather than SQL.')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS,
+            help='Nominates a database. Defaults to the "default" database.')
+
+    def handle(self, *args, **options):
+        if options['migration']:
+            return self.print_operations(options['models'], options['drop'])
+        connection = connections[options['database']]
+        sql_for = drop_trigger_sql if options['drop'] else create_trigger_sql
+        statements = []
+        for model in self.immutable_models(options['models']):
+            statements.extend(sql_for(model, connection))
+        if options['execute']:
+            with connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
+        else:
+            for sql in statements:
+                self.stdout.write('%s;\n' % sql)
+
+    def print_operations(self, labels, drop):
+        from django.db.migrations.writer import OperationWriter
+        operation_class = DropImmutableTriggers if drop else CreateImmutableTriggers
+        for model in self.immutable_models(labels):
+            self.stdout.write('# %s\n' % model._meta.app_label)
+            operation, imports = OperationWriter(operation_class.for_model(model), indentation=0).serialize()
+            self.stdout.write('%s\n' % operation)
+
+    def immutable_models(self, labels):
+        if not labels:
+            candidates = apps.get_models()
+        else:
+            candidates = []
+            for label in labels:
+                try:
+                    if '.' in label:
+                        candidates.append(apps.get_model(label))
+                    else:
+                        candidates.extend(apps.get_app_config(label).get_models())
+                except LookupError as e:
+                    raise CommandError(str(e))
+        return [model for model in candidates
+                if issubclass(model, ImmutableModel) and not model._meta.proxy]
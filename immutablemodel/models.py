@@ -1,7 +1,20 @@
 # encoding: utf-8
-from django.db import models
+import hashlib
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connections, models
+from django.db.models.base import ModelState, model_unpickle, simple_class_factory
+from django.db.models.signals import post_delete, post_init, pre_init
+from django.db.models.query_utils import DeferredAttribute
 from django.utils import six
 
+from .asynchronous import run_in_thread
+from .cache import instance_cache, invalidate
+from .checks import check_immutable_options
+from .fingerprint import fingerprint, fingerprinted_fields
+from .query import ImmutableManager, unlocked_filter
+from .signals import immutable_write_blocked, immutable_delete_blocked
+
 
 class Option(object):
     def __init__(self, name, default=None):
@@ -34,6 +47,9 @@ class __Undefined(object):
         return six.text_type("__Undefined()")
 UNDEFINED = __Undefined()
 
+# bound once: ImmutableModel.__setattr__ runs for every attribute write
+_model_setattr = models.Model.__setattr__
+
 class PK_FIELD: pass
 
 IMMUTABLEFIELD_OPTIONS = dict([(opt.name, opt) for opt in (
@@ -42,6 +58,10 @@ IMMUTABLEFIELD_OPTIONS = dict([(opt.name, opt) for opt in (
     QuietOption('immutable_quiet'),
     Option('immutable_lock_field', default=PK_FIELD),
     Option('immutable_is_deletable', default=True),
+    Option('immutable_descriptors', default=False),
+    Option('immutable_python_guard', default=True),
+    Option('immutable_cache_instances', default=False),
+    Option('immutable_fingerprint_field', default=None),
     )])
 
 
@@ -81,7 +101,7 @@ class ImmutableModelMeta(models.base.ModelBase):
 
     @staticmethod
     def strip_immutability_options(meta):
-        if "immutable" in dir(meta):
+        if hasattr(meta, "immutable"):
             raise ValueError("immutable is not an option for ImmutableModels - use immutable_fields instead")
         stripped = {}
         for opt_name in IMMUTABLEFIELD_OPTIONS:
@@ -98,80 +118,584 @@ class ImmutableModelMeta(models.base.ModelBase):
     @staticmethod
     def check_and_reinject_options(immutability_options, model):
         for opt_name, value in six.iteritems(immutability_options):
+            if value is UNDEFINED and model._meta.proxy:
+                # proxies (including the classes django builds for .only()/.defer())
+                # share the options of the model they stand in for
+                value = getattr(model._meta.proxy_for_model._meta, opt_name, UNDEFINED)
             if value is UNDEFINED and getattr(model._meta, opt_name, UNDEFINED) is UNDEFINED:
                 #only want to use default when registered_model doesn't have a value yet
                 value = IMMUTABLEFIELD_OPTIONS[opt_name].get_default_for(model)
             if value is not UNDEFINED:
                 setattr(model._meta, opt_name, value)
 
-        if not isinstance(model._meta.immutable_fields, list):
-            raise TypeError('immutable_fields attribute in %s must be '
-                            'a list' % model)
-        if not isinstance(model._meta.mutable_fields, list):
-            raise TypeError('mutable_fields attribute in %s must be '
-                            'a list' % model)
+        # kept as written, for the system checks (see ImmutableModel.check)
+        model._meta.immutable_meta_options = immutability_options
 
-        if immutability_options['mutable_fields'] and immutability_options["immutable_fields"]:
-            we_found = ("We found:\n" +
-            ("mutable_fields: %s\n" % "mutable_fields")+
-            ("immutable_fields: %s\n" % immutability_options["immutable_fields"])
-            )
-            raise ValueError('You can specify either mutable_fields OR immutable_fields in %s (not both).\n%s' % (model, we_found))
+        for opt_name in ('immutable_fields', 'mutable_fields'):
+            # a string here would be read as one field name per character
+            if not isinstance(getattr(model._meta, opt_name), (list, tuple)):
+                raise TypeError('%s attribute in %s must be a list (or tuple)' % (opt_name, model))
 
         if immutability_options["immutable_fields"]:
             model._meta.mutable_fields = [f.name for f in model._meta.fields if f.name not in immutability_options["immutable_fields"]]
-        # we'll make immutable_admin_fields as the reverse of mutable fields:
-        model._meta.immutable_admin_fields = [f.name for f in model._meta.fields if f.name not in model._meta.mutable_fields]
 
+        if model._meta.immutable_lock_field is PK_FIELD and not model._meta.abstract:
+            # (ignored in abstract models)
+            model._meta.immutable_lock_field = model._meta.pk.name
+
+        if model._meta.immutable_cache_instances and not model._meta.abstract:
+            post_delete.connect(_forget_deleted, sender=model, weak=False,
+                                dispatch_uid='immutablemodel.forget_deleted')
+            # only these models pay for the extra step when loading rows, on
+            # top of their own from_db (if they have one)
+            from_db = model.from_db.__func__
+            if not getattr(from_db, 'immutable_caching', False):
+                model.from_db = classmethod(_from_db_caching(from_db))
+
+        ImmutableModelMeta.compile_field_tables(model)
+        # ImmutableModel.__setattr__ notes which fields have been written to,
+        # unless it's been replaced by one of the following
+        model._meta.immutable_tracks_writes = False
         if model._meta.abstract:
-            # ignore immutable_lock_field in abstract models
             pass
+        elif not model._meta.immutable_python_guard:
+            # left to the database (see immutablemodel.triggers)
+            model.__setattr__ = _model_setattr
+        elif model._meta.immutable_descriptors:
+            ImmutableModelMeta.install_field_descriptors(model)
         else:
-            if model._meta.immutable_lock_field is PK_FIELD:
-                model._meta.immutable_lock_field = model._meta.pk.name
-            elif (isinstance(model._meta.immutable_lock_field, six.string_types) or
-                model._meta.immutable_lock_field is None
-                ):
-                pass
+            model._meta.immutable_tracks_writes = True
+        ImmutableModelMeta.compile_cached_properties(model)
+
+    @staticmethod
+    def compile_field_tables(model):
+        """
+        Precompute the lookups used by ImmutableModel.can_change_field, so that
+        guarding an attribute write is a set probe rather than a list scan.
+        """
+        opts = model._meta
+        mutable_names = set(opts.mutable_fields)
+        if opts.immutable_fingerprint_field is not None:
+            # derived from the immutable fields: filled in whenever it's missing
+            mutable_names.add(opts.immutable_fingerprint_field)
+        guarded_fields = {}
+        # we'll make immutable_admin_fields as the reverse of mutable fields:
+        admin_fields = []
+        for f in opts.fields:
+            if f.name not in opts.mutable_fields:
+                admin_fields.append(f.name)
+            if f.name in mutable_names or f.name.startswith('_'):
+                mutable_names.update((f.name, f.attname))
             else:
-                raise TypeError('immutable_lock_field attribute in '
-                                '%s must be a string (or None, or omitted)' % model)
+                guarded_fields[f.name] = f
+                guarded_fields[f.attname] = f
+        opts.immutable_admin_fields = admin_fields
+        opts.immutable_mutable_names = frozenset(mutable_names)
+        opts.immutable_guarded_fields = guarded_fields
+        opts.immutable_pk_attname = opts.pk.attname if opts.pk else None
+        opts.immutable_lock_attname = None
+        for f in opts.concrete_fields:
+            if f.name == opts.immutable_lock_field:
+                opts.immutable_lock_attname = f.attname
+        opts.immutable_pickled_attnames = tuple(f.attname for f in opts.concrete_fields)
+        # pickled with the values, which are only good for the same fields in the same order
+        opts.immutable_pickled_layout = hashlib.md5(
+            ','.join(opts.immutable_pickled_attnames).encode('utf-8')).hexdigest()[:8]
+        opts.immutable_saved_attnames = frozenset(f.attname for f in opts.concrete_fields if not f.primary_key)
+        # all that can differ from the database once immutable
+        opts.immutable_refreshed_attnames = tuple(
+            f.attname for f in opts.concrete_fields if not f.primary_key and (
+                f.attname in mutable_names or f.name == opts.immutable_lock_field))
+        # writes to these, not yet saved, can make the instance look locked
+        # when its row isn't (or hide what was changed before it was locked)
+        opts.immutable_locking_attnames = frozenset(guarded_fields).union(
+            [opts.immutable_lock_attname] if opts.immutable_lock_attname else ())
+        opts.immutable_fingerprinted_fields = fingerprinted_fields(model)
+        opts.immutable_fingerprinted_attnames = frozenset(f.attname for f in opts.immutable_fingerprinted_fields)
+
+    @staticmethod
+    def compile_cached_properties(model):
+        """
+        Map each attribute to the immutable_cached_property values to forget
+        when it's written to, and make __setattr__ forget them.
+        """
+        opts = model._meta
+        properties = {}
+        seen = set()
+        for klass in model.__mro__:
+            if not isinstance(klass, ImmutableModelMeta):
+                continue
+            for name, value in six.iteritems(klass.__dict__):
+                if name not in seen:
+                    seen.add(name)
+                    if isinstance(value, immutable_cached_property):
+                        properties[name] = value
+        opts.immutable_transient_properties = frozenset(
+            name for name, prop in six.iteritems(properties) if not prop.persist)
+        opts.immutable_property_dependents = {}
+        if not properties or opts.abstract:
+            return
+        fields = dict((f.name, f) for f in opts.fields)
+        fields.update((f.attname, f) for f in opts.fields)
+        dependents = {}
+        for name, prop in six.iteritems(properties):
+            # unlocking the instance lets any of its fields change
+            for depends_on in prop.depends_on + (opts.immutable_lock_field,):
+                if depends_on is None:
+                    continue
+                field = fields.get(depends_on)
+                for attribute in (field.name, field.attname) if field else (depends_on,):
+                    dependents.setdefault(attribute, set()).add(name)
+        opts.immutable_property_dependents = dict((k, tuple(v)) for k, v in six.iteritems(dependents))
+        model.__setattr__ = _forgetting_setattr(
+            ImmutableModel.__setattr__ if opts.immutable_tracks_writes else _model_setattr)
+
+    @staticmethod
+    def install_field_descriptors(model):
+        """
+        Guard only the immutable fields, each with its own data descriptor, and
+        let every other attribute write take the normal (C level) path.
+        """
+        for name in model._meta.immutable_guarded_fields:
+            current = None
+            for klass in model.__mro__:
+                if name in klass.__dict__:
+                    current = klass.__dict__[name]
+                    break
+            if isinstance(current, ImmutableFieldDescriptor):
+                current = getattr(current, 'wrapped', None)
+            if isinstance(current, DeferredAttribute):
+                # django recognises deferred fields by their descriptor's type
+                descriptor = ImmutableDeferredAttribute(current.field_name, model)
+            elif current is not None:
+                descriptor = WrappingImmutableFieldDescriptor(name, current)
+            else:
+                descriptor = ImmutableFieldDescriptor(name)
+            setattr(model, name, descriptor)
+        model.__setattr__ = _model_setattr
+
+
+def _forgetting_setattr(model_setattr):
+    def __setattr__(self, name, value):
+        names = self._meta.immutable_property_dependents.get(name)
+        if names and self.__dict__.get(name, UNDEFINED) != value:
+            data = self.__dict__
+            for cached in names:
+                data.pop(cached, None)
+        model_setattr(self, name, value)
+    return __setattr__
+
+
+class immutable_cached_property(object):
+    """
+    Like django's cached_property, but only kept once the instance is
+    immutable, and forgotten when any of the fields it depends on (or the
+    lock field) are written to. With persist=True, it's pickled along with
+    the instance::
+
+        @immutable_cached_property('discount')
+        def total(self):
+            ...
+    """
+    def __init__(self, *depends_on, **kwargs):
+        self.persist = kwargs.pop('persist', False)
+        if kwargs:
+            raise TypeError('unexpected keyword arguments: %s' % ', '.join(sorted(kwargs)))
+        if len(depends_on) == 1 and callable(depends_on[0]):
+            # used without arguments: @immutable_cached_property
+            self(depends_on[0])
+            depends_on = ()
+        self.depends_on = depends_on
+
+    def __call__(self, func):
+        self.func = func
+        self.name = func.__name__
+        self.__doc__ = func.__doc__
+        return self
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        value = self.func(instance)
+        if instance.is_immutable():
+            # from now on, found in the instance's __dict__ without calling this
+            instance.__dict__[self.name] = value
+        return value
+
+
+def _from_db_caching(from_db):
+    # from_db (given the class), then caching the instance
+    def caching_from_db(cls, db, field_names, values):
+        new = from_db(cls, db, field_names, values)
+        # (rows read in a transaction may yet be rolled back)
+        if not cls._deferred and not connections[db].in_atomic_block and new.is_immutable():
+            instance_cache.put(new, db, values)
+        return new
+    caching_from_db.immutable_caching = True
+    return caching_from_db
+
+
+def _forget_deleted(sender, instance, using, **kwargs):
+    invalidate(sender, using, instance.pk)
+    # deleted by a Collector (from a queryset, or a cascade), which clears
+    # the primary key (and maybe foreign keys) next
+    instance.__dict__['_deleting_immutable_model'] = True
+
+
+def _sender(instance):
+    # like django's own signals: the model, rather than a deferred class
+    cls = instance.__class__
+    return cls._meta.proxy_for_model if cls._deferred else cls
+
+
+def _write_allowed(instance, name, value):
+    return (not instance._immutable_guarded or instance.can_change_field(name) or
+        not instance._immutable_write_blocked(name, value))
+
+
+class ImmutableFieldDescriptor(object):
+    """
+    Guards writes to one immutable field (see the immutable_descriptors option).
+    It has no __get__, so reads go straight to the instance __dict__.
+    """
+    def __init__(self, name):
+        self.name = name
+
+    def __set__(self, instance, value):
+        if _write_allowed(instance, self.name, value):
+            instance.__dict__[self.name] = value
+
+
+class WrappingImmutableFieldDescriptor(ImmutableFieldDescriptor):
+    """
+    Guards writes to an attribute django already manages with its own
+    descriptor (eg. the related object of a ForeignKey)
+    """
+    def __init__(self, name, wrapped):
+        super(WrappingImmutableFieldDescriptor, self).__init__(name)
+        self.wrapped = wrapped
+
+    def __getattr__(self, name):
+        return getattr(self.wrapped, name)
 
-        if not isinstance(model._meta.immutable_quiet, bool):
-            raise TypeError('immutable_quiet attribute in %s must '
-                            'be boolean' % model)
+    def __get__(self, instance, owner):
+        return self.wrapped.__get__(instance, owner)
 
-        if not isinstance(model._meta.immutable_is_deletable, bool):
-            raise TypeError('immutable_is_deletable attribute in %s must '
-                            'be boolean' % model)
+    def __set__(self, instance, value):
+        if _write_allowed(instance, self.name, value):
+            self.wrapped.__set__(instance, value)
+
+
+class ImmutableDeferredAttribute(DeferredAttribute):
+    """Guards writes to an immutable field that was deferred with only()/defer()"""
+    def __set__(self, instance, value):
+        if _write_allowed(instance, self.field_name, value):
+            super(ImmutableDeferredAttribute, self).__set__(instance, value)
 
 class ImmutableModel(six.with_metaclass(ImmutableModelMeta, models.Model)):
+    _immutable_guarded = True
+
+    objects = ImmutableManager()
+
+    def __init__(self, *args, **kwargs):
+        # Model.__init__ assigns every field exactly once, so nothing can be
+        # changed until the instance is built: skip the guard.
+        self.__dict__['_immutable_guarded'] = False
+        super(ImmutableModel, self).__init__(*args, **kwargs)
+        del self.__dict__['_immutable_guarded']
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """
+        Build the instance straight from the row, as __setstate__ does: the
+        values go into __dict__ with no __setattr__ (nor guard) per field.
+        Deferred classes, models with their own __init__ and models something
+        listens to pre_init or post_init for are built the usual way.
+        """
+        if (cls._deferred or six.get_unbound_function(cls.__init__) is not _immutable_init or
+                pre_init.has_listeners(cls) or post_init.has_listeners(cls)):
+            return super(ImmutableModel, cls).from_db(db, field_names, values)
+        new = cls.__new__(cls)
+        data = new.__dict__
+        data.update(zip(field_names, values))
+        data['_state'] = model_state = ModelState()
+        model_state.db = db
+        model_state.adding = False
+        return new
+
+    @classmethod
+    def check(cls, **kwargs):
+        errors = super(ImmutableModel, cls).check(**kwargs)
+        errors.extend(check_immutable_options(cls))
+        return errors
+
     def can_change_field(self, field_name):
+        opts = self._meta
+        if field_name in opts.immutable_mutable_names:
+            return True
         if field_name.startswith('_'):
             return True  # allow changing private fields, no matter immutability
-        field_changable = field_name in self._meta.mutable_fields or not self.is_immutable()
-        if not field_changable and field_name == self._meta.pk.attname:
-            if getattr(self, '_deleting_immutable_model', False):
-                #deleting this immutable model, so need to allow Collector.delete to change the field
-                return True
-        return field_changable
+        if not self.is_immutable():
+            return True
+        if getattr(self, '_deleting_immutable_model', False):
+            # deleting this immutable model, so need to allow Collector.delete to
+            # change the fields (the primary key, and foreign keys it clears)
+            return True
+        return False
 
     def __setattr__(self, name, value):
-        if not self.can_change_field(name):
+        if self._immutable_guarded:
+            if self.can_change_field(name):
+                changed = True
+            elif self._immutable_write_blocked(name, value):
+                return
+            else:
+                # let through as it changes nothing (or fills in an empty value)
+                changed = self.__dict__.get(name, UNDEFINED) != value
+            if changed and name in self._meta.immutable_saved_attnames:
+                try:
+                    self.__dict__['_immutable_dirty'].add(name)
+                except KeyError:
+                    self.__dict__['_immutable_dirty'] = set([name])
+        _model_setattr(self, name, value)
+
+    def _immutable_write_blocked(self, name, value):
+        # only called for fields that can't be changed: True when the write
+        # should be quietly dropped, raises when immutable_quiet is off
+        if not self.changes_loaded_value(name, value):
+            return False
+        immutable_write_blocked.send(sender=_sender(self), instance=self, name=name, value=value)
+        if self._meta.immutable_quiet:
+            return True
+        raise ValueError('%s.%s is immutable and cannot be changed' % (self.__class__.__name__, name))
+
+    def changes_loaded_value(self, name, value):
+        """
+        Would setting name to value change what this instance has loaded?
+
+        Only the instance's own state is consulted, never the database: a
+        deferred field that hasn't been loaded counts as changed, and a related
+        object is compared by the key it would store.
+        """
+        field = self._meta.immutable_guarded_fields.get(name)
+        if field is None:
+            # not a field (eg. a plain attribute or a property)
             try:
                 current_value = getattr(self, name, None)
-            except:
+            except Exception:
                 current_value = None
-            if current_value is not None and current_value is not '' and \
-                getattr(current_value, '_file', 'not_existant') is not None and \
-                current_value != value:
-                if self._meta.immutable_quiet:
-                    return
-                raise ValueError('%s.%s is immutable and cannot be changed' % (self.__class__.__name__, name))
-        super(ImmutableModel, self).__setattr__(name, value)
+        elif name == field.attname:
+            current_value = self.__dict__.get(name, UNDEFINED)
+            if current_value is UNDEFINED:
+                return True
+        else:
+            for lh_field, rh_field in field.related_fields:
+                related_value = None if value is None else getattr(value, rh_field.attname)
+                if self.changes_loaded_value(lh_field.attname, related_value):
+                    return True
+            return False
+        return (current_value is not None and current_value != '' and
+            getattr(current_value, '_file', 'not_existant') is not None and
+            current_value != value)
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        dirty = self.__dict__.get('_immutable_dirty')
+        if (fields is None and not self._state.adding and self.is_immutable() and
+                not (dirty and not dirty.isdisjoint(self._meta.immutable_locking_attnames))):
+            # the immutable fields can't have changed
+            fields = [attname for attname in self._meta.immutable_refreshed_attnames
+                      if attname in self.__dict__]
+            if not fields:
+                return
+        # values read back from the database replace what was loaded rather
+        # than changing it (this is also how deferred fields get loaded)
+        self.__dict__['_immutable_guarded'] = False
+        try:
+            super(ImmutableModel, self).refresh_from_db(using, fields, **kwargs)
+        finally:
+            self.__dict__.pop('_immutable_guarded', None)
+        if fields is None:
+            self.__dict__.pop('_immutable_dirty', None)
+            self.__dict__.pop('_immutable_fingerprint', None)
+        elif '_immutable_dirty' in self.__dict__:
+            self.__dict__['_immutable_dirty'].difference_update(fields)
+
+    def save(self, force_insert=False, force_update=False, using=None, update_fields=None):
+        """
+        Once immutable, only the fields written to since the instance was
+        loaded (or last saved) can have changed, so only those are saved: when
+        there are none, nothing is sent to the database.
+        """
+        fingerprint_field = self._meta.immutable_fingerprint_field
+        if fingerprint_field is not None and self.is_immutable():
+            # locked now, if not before: a new fingerprint counts as written to
+            self.immutable_fingerprint
+            fingerprint_attname = self._meta.get_field(fingerprint_field).attname
+            if update_fields is not None and fingerprint_attname in self.__dict__.get('_immutable_dirty', ()):
+                update_fields = set(update_fields)
+                update_fields.add(fingerprint_attname)
+        if (update_fields is None and not force_insert and self._meta.immutable_tracks_writes and
+                not self._state.adding and using in (None, self._state.db) and self.is_immutable()):
+            dirty = self.__dict__.get('_immutable_dirty')
+            if not dirty:
+                return
+            update_fields = dirty.union(
+                f.attname for f in self._meta.concrete_fields if getattr(f, 'auto_now', False))
+        # (a new instance given its primary key may still overwrite a row)
+        may_overwrite = not self._state.adding or self.pk is not None
+        try:
+            super(ImmutableModel, self).save(force_insert, force_update, using, update_fields)
+        finally:
+            self.__dict__.pop('_immutable_locked_meanwhile', None)
+        if may_overwrite and self._meta.immutable_cache_instances:
+            invalidate(self.__class__, self._state.db, self.pk)
+        if update_fields is None:
+            self.__dict__.pop('_immutable_dirty', None)
+            self.__dict__.pop('_immutable_fingerprint', None)
+        elif '_immutable_dirty' in self.__dict__:
+            update_fields = frozenset(update_fields)
+            self.__dict__['_immutable_dirty'].difference_update(
+                f.attname for f in self._meta.concrete_fields
+                if f.name in update_fields or f.attname in update_fields)
+    save.alters_data = True
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        """
+        Changes to immutable fields of an instance loaded unlocked are only
+        written while the row is still unlocked in the database (UPDATE ...
+        WHERE <lock_field> = false), so that a row locked after this instance
+        was loaded keeps its values. When it was, only the mutable fields are
+        saved - unless immutable fields were changed and immutable_quiet is
+        off, which raises ValueError. The writes to a locked instance have
+        already been let through by __setattr__, and are saved as they are.
+        """
+        opts = self._meta
+        guarded = [value for value in values if value[0].attname not in opts.immutable_mutable_names]
+        if not guarded or self._immutable_locked_when_loaded():
+            return super(ImmutableModel, self)._do_update(
+                base_qs, using, pk_val, values, update_fields, forced_update)
+        if self.__dict__.get('_immutable_locked_meanwhile'):
+            # (with multi-table inheritance) the table of the lock field, saved
+            # before this one, was found locked
+            return self._do_update_locked(base_qs, using, pk_val, values, guarded, update_fields, forced_update)
+        try:
+            lock_field = opts.get_field(opts.immutable_lock_field or '')
+        except FieldDoesNotExist:
+            lock_field = None
+        # only the table holding the lock can be updated on condition of it
+        unlocked = None
+        if lock_field is not None and lock_field.model._meta.concrete_model is base_qs.model:
+            unlocked = unlocked_filter(base_qs.model, lock_field.name)
+        if unlocked is None:
+            return super(ImmutableModel, self)._do_update(
+                base_qs, using, pk_val, values, update_fields, forced_update)
+        if super(ImmutableModel, self)._do_update(
+                base_qs.filter(unlocked), using, pk_val, values, update_fields, forced_update):
+            return True
+        # the row has gone, or been locked since this instance was loaded
+        self.__dict__['_immutable_locked_meanwhile'] = True
+        return self._do_update_locked(base_qs, using, pk_val, values, guarded, update_fields, forced_update)
+
+    def _immutable_locked_when_loaded(self):
+        # immutable, and not by a lock written to since (which isn't saved yet)
+        return self.is_immutable() and self._meta.immutable_lock_attname not in self.__dict__.get('_immutable_dirty', ())
+
+    def _do_update_locked(self, base_qs, using, pk_val, values, guarded, update_fields, forced_update):
+        # save only the mutable values to a row found locked
+        opts = self._meta
+        current = base_qs.filter(pk=pk_val).values(*[field.attname for field, _, _ in guarded]).first()
+        if current is None:
+            return False
+        changed = [field.name for field, _, value in guarded if current[field.attname] != value]
+        if changed and not opts.immutable_quiet:
+            raise ValueError('%s.%s is immutable and cannot be changed' % (self.__class__.__name__, changed[0]))
+        # (nor is the row unlocked again, by the stale value of the lock field,
+        # nor given the fingerprint of values it didn't keep)
+        left_out = (opts.immutable_lock_field, opts.immutable_fingerprint_field)
+        mutable = [value for value in values if value[0].attname in opts.immutable_mutable_names and
+                   value[0].name not in left_out]
+        if mutable:
+            super(ImmutableModel, self)._do_update(base_qs, using, pk_val, mutable, update_fields, forced_update)
+        return True
+
+    def __reduce__(self):
+        """
+        Pickle the field values as a tuple in the model's field order (plus the
+        database, adding, and any other attributes) rather than the whole
+        __dict__. Instances with deferred fields are pickled the usual way.
+        """
+        if self._deferred:
+            return self._immutable_reduce_usual()
+        data = self.__dict__
+        attnames = self._meta.immutable_pickled_attnames
+        try:
+            values = tuple([data[attname] for attname in attnames])
+        except KeyError:
+            return self._immutable_reduce_usual()
+        transient = self._meta.immutable_transient_properties
+        extra = dict((k, v) for k, v in six.iteritems(data)
+                     if k not in attnames and k != '_state' and k not in transient) or None
+        class_id = self._meta.app_label, self._meta.object_name
+        return (model_unpickle, (class_id, [], simple_class_factory),
+                (self._meta.immutable_pickled_layout, values, self._state.db, self._state.adding, extra))
+
+    def _immutable_reduce_usual(self):
+        reduced = super(ImmutableModel, self).__reduce__()
+        transient = self._meta.immutable_transient_properties
+        if transient.intersection(reduced[2]):
+            # (the state is the instance's own __dict__)
+            state = dict((k, v) for k, v in six.iteritems(reduced[2]) if k not in transient)
+            reduced = reduced[:2] + (state,) + reduced[3:]
+        return reduced
+
+    def __setstate__(self, state):
+        if isinstance(state, dict):
+            # pickled the usual way
+            return super(ImmutableModel, self).__setstate__(state)
+        layout, values, db, adding, extra = state
+        attnames = self._meta.immutable_pickled_attnames
+        if layout != self._meta.immutable_pickled_layout or len(values) != len(attnames):
+            raise ValueError('%s was pickled with different fields' % self.__class__.__name__)
+        # restored as loaded, not written to: straight into __dict__
+        data = self.__dict__
+        data.update(zip(attnames, values))
+        data['_state'] = model_state = ModelState()
+        model_state.db = db
+        model_state.adding = adding
+        if extra:
+            data.update(extra)
+
+    @property
+    def immutable_fingerprint(self):
+        """
+        Once the instance is immutable (None until then), a sha1 (in hex) of
+        its immutable field values: see immutablemodel.fingerprint. It's worked
+        out once, then kept in the immutable_fingerprint_field (if the model
+        has one) or on the instance.
+        """
+        if not self.is_immutable():
+            return None
+        opts = self._meta
+        data = self.__dict__
+        if opts.immutable_fingerprint_field is not None:
+            attname = opts.get_field(opts.immutable_fingerprint_field).attname
+        else:
+            attname = '_immutable_fingerprint'
+        # fields written to before the instance was locked (and not yet saved)
+        # may not be what it was fingerprinted with
+        if data.get(attname) and not opts.immutable_fingerprinted_attnames.intersection(
+                data.get('_immutable_dirty', ())):
+            return data[attname]
+        value = fingerprint(self.__class__, [getattr(self, f.attname) for f in opts.immutable_fingerprinted_fields])
+        if data.get(attname) != value and attname in opts.immutable_saved_attnames:
+            # to be saved with the row
+            data.setdefault('_immutable_dirty', set()).add(attname)
+        data[attname] = value
+        return value
 
     def is_immutable(self):
-        if self.has_immutable_lock_field():
+        immutable_lock_field = self._meta.immutable_lock_field
+        if immutable_lock_field is not None:
             """
             During the creation of a Django ORM object, as far as we know,
             the object starts with no fields and they are added after the object
@@ -180,7 +704,7 @@ class ImmutableModel(six.with_metaclass(ImmutableModelMeta, models.Model)):
             In the presence of a immutable_lock field decision,
             if the field does not exists, it can be changed.
             """
-            return getattr(self, self._meta.immutable_lock_field, True)
+            return getattr(self, immutable_lock_field, True)
         return True
 
     def has_immutable_lock_field(self):
@@ -188,6 +712,7 @@ class ImmutableModel(six.with_metaclass(ImmutableModelMeta, models.Model)):
 
     def delete(self):
         if not self._meta.immutable_is_deletable and self.is_immutable():
+            immutable_delete_blocked.send(sender=_sender(self), instance=self)
             if self._meta.immutable_quiet:
                 return
             else:
@@ -196,7 +721,21 @@ class ImmutableModel(six.with_metaclass(ImmutableModelMeta, models.Model)):
                 )
         self._deleting_immutable_model = True
         super(ImmutableModel, self).delete()
-        delattr(self, '_deleting_immutable_model')
+        self.__dict__.pop('_deleting_immutable_model', None)
+
+    def asave(self, *args, **kwargs):
+        """save(), awaitable: see immutablemodel.asynchronous"""
+        return run_in_thread(self.save, *args, **kwargs)
+    asave.alters_data = True
+
+    def adelete(self):
+        """delete(), awaitable: see immutablemodel.asynchronous"""
+        return run_in_thread(self.delete)
+    adelete.alters_data = True
 
     class Meta:
         abstract = True
+
+
+# (from_db builds instances without it, unless a model has its own)
+_immutable_init = ImmutableModel.__dict__['__init__']
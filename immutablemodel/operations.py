@@ -0,0 +1,75 @@
+# encoding: utf-8
+from django.apps import apps
+from django.db.migrations.operations.base import Operation
+from django.utils.encoding import force_text
+
+from .triggers import create_trigger_sql, drop_trigger_sql, trigger_options
+
+
+class CreateImmutableTriggers(Operation):
+    """
+    Migration operation installing the database triggers for an ImmutableModel.
+
+    Historical models don't carry the immutability options, so the operation
+    keeps them itself: options are the model's trigger_options when the
+    migration was written (``immutable_triggers --migration`` prints them).
+    Without options, the triggers follow the model's current Meta.
+    """
+    reversible = True
+
+    def __init__(self, model_name, options=None):
+        self.model_name = model_name
+        self.options = options
+
+    @classmethod
+    def for_model(cls, model):
+        """The operation for model, with its options as they are now"""
+        return cls(force_text(model._meta.object_name), options=trigger_options(model))
+
+    def deconstruct(self):
+        kwargs = {}
+        if self.options is not None:
+            kwargs['options'] = self.options
+        return (self.__class__.__name__, [self.model_name], kwargs)
+
+    def state_forwards(self, app_label, state):
+        pass
+
+    def create(self, app_label, schema_editor):
+        options = self.options
+        if options is None:
+            options = trigger_options(apps.get_model(app_label, self.model_name))
+        for sql in create_trigger_sql(options, schema_editor.connection):
+            schema_editor.execute(sql, params=None)
+
+    def drop(self, app_label, schema_editor, state):
+        if self.options is not None:
+            db_table = self.options['db_table']
+        else:
+            # only the table is needed, which the historical model knows
+            model_apps = apps if state is None else state.apps
+            db_table = model_apps.get_model(app_label, self.model_name)._meta.db_table
+        for sql in drop_trigger_sql(db_table, schema_editor.connection):
+            schema_editor.execute(sql, params=None)
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        self.create(app_label, schema_editor)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        self.drop(app_label, schema_editor, from_state)
+
+    def describe(self):
+        return "Create immutability triggers for %s" % self.model_name
+
+
+class DropImmutableTriggers(CreateImmutableTriggers):
+    """Migration operation removing the database triggers for an ImmutableModel"""
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        self.drop(app_label, schema_editor, from_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        self.create(app_label, schema_editor)
+
+    def describe(self):
+        return "Drop immutability triggers for %s" % self.model_name
@@ -0,0 +1,170 @@
+# encoding: utf-8
+"""
+How much a request (or any block of code) spends in the immutability checks:
+
+    with GuardProfile() as profile:
+        ...
+    profile.models[CruiseShip]['can_change_field']  # {'calls': 12, 'seconds': 0.0004}
+    profile.models[CruiseShip]['queries']           # SQL run by the checks
+
+or, for each request, add ImmutableGuardProfilingMiddleware to MIDDLEWARE_CLASSES.
+"""
+import functools
+import logging
+import threading
+import time
+
+from django.db import connections
+
+from . import hooks
+from .admin import ImmutableModelAdmin
+from .models import ImmutableModel
+
+logger = logging.getLogger('immutablemodel.profiling')
+
+# (class, method name, how to find the model from the arguments)
+PROFILED = (
+    (ImmutableModel, 'can_change_field', lambda self, *args: self.__class__),
+    (ImmutableModel, 'is_immutable', lambda self, *args: self.__class__),
+    # the admin reloading the lock state of an object
+    (ImmutableModelAdmin, 'get_lock_state', lambda self, obj: obj.__class__),
+)
+
+_local = threading.local()
+_lock = threading.Lock()
+_profiling = 0
+
+
+def _active():
+    return getattr(_local, 'profiles', None)
+
+
+def _last_query(connection):
+    log = connection.queries_log
+    return log[-1] if log else None
+
+
+def _queries_since(connection, last):
+    # read from the end, as the oldest queries drop out once the log is full
+    queries = []
+    for query in reversed(connection.queries_log):
+        if query is last:
+            break
+        queries.append(query['sql'])
+    queries.reverse()
+    return queries
+
+
+def _profiled(original, name, model_of):
+    def method(*args, **kwargs):
+        profiles = _active()
+        if not profiles:
+            return original(*args, **kwargs)
+        outermost = not getattr(_local, 'depth', 0)
+        if outermost:
+            logged = [(connection, _last_query(connection)) for connection in connections.all()]
+        _local.depth = getattr(_local, 'depth', 0) + 1
+        start = time.time()
+        try:
+            return original(*args, **kwargs)
+        finally:
+            elapsed = time.time() - start
+            _local.depth -= 1
+            model = model_of(*args)._meta.concrete_model
+            queries = []
+            if outermost:
+                for connection, last in logged:
+                    queries.extend(_queries_since(connection, last))
+            for profile in profiles:
+                profile.add(model, name, elapsed, queries)
+    method.__name__ = name
+    return method
+
+
+# (class, method name, wrapper) for immutablemodel.hooks
+WRAPPERS = [(klass, name, functools.partial(_profiled, name=name, model_of=model_of))
+            for klass, name, model_of in PROFILED]
+
+
+def _patch():
+    global _profiling
+    with _lock:
+        _profiling += 1
+        if _profiling > 1:
+            return
+        for klass, name, wrapper in WRAPPERS:
+            hooks.add(klass, name, wrapper)
+
+
+def _unpatch():
+    global _profiling
+    with _lock:
+        _profiling -= 1
+        if _profiling:
+            return
+        for klass, name, wrapper in WRAPPERS:
+            hooks.remove(klass, name, wrapper)
+
+
+class GuardProfile(object):
+    """
+    Calls to (and time spent in) can_change_field, is_immutable and the admin's
+    get_lock_state, and the queries they ran, per model, for this thread
+    while started.
+    """
+    def __init__(self):
+        self.models = {}
+        self._debug_cursors = None
+
+    def add(self, model, name, seconds, queries):
+        counts = self.models.setdefault(model, {'queries': []})
+        timing = counts.setdefault(name, {'calls': 0, 'seconds': 0.0})
+        timing['calls'] += 1
+        timing['seconds'] += seconds
+        counts['queries'].extend(queries)
+
+    def start(self):
+        _patch()
+        # so that the queries are logged, whatever DEBUG is
+        self._debug_cursors = [(connection, connection.force_debug_cursor) for connection in connections.all()]
+        for connection, _ in self._debug_cursors:
+            connection.force_debug_cursor = True
+        if _active() is None:
+            _local.profiles = []
+        _local.profiles.append(self)
+        return self
+
+    def stop(self):
+        _local.profiles.remove(self)
+        for connection, force_debug_cursor in self._debug_cursors:
+            connection.force_debug_cursor = force_debug_cursor
+        _unpatch()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def report(self):
+        """The results as a dict by 'app_label.ModelName', eg. to log"""
+        return dict(('%s.%s' % (model._meta.app_label, model._meta.object_name), counts)
+                    for model, counts in self.models.items())
+
+
+class ImmutableGuardProfilingMiddleware(object):
+    """
+    Profiles each request with a GuardProfile, logging its report to the
+    immutablemodel.profiling logger and leaving it on the request as
+    request.immutable_guard_profile.
+    """
+    def process_request(self, request):
+        request.immutable_guard_profile = GuardProfile().start()
+
+    def process_response(self, request, response):
+        profile = getattr(request, 'immutable_guard_profile', None)
+        if profile is not None and profile in (_active() or ()):
+            profile.stop()
+            for label, counts in sorted(profile.report().items()):
+                logger.info('%s %s: %s', request.path, label, counts)
+        return response
@@ -0,0 +1,261 @@
+# encoding: utf-8
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connections, models, transaction
+from django.db.models import Case, Q, Value, When
+
+from . import cache
+from .asynchronous import run_in_thread
+from .fingerprint import fingerprint
+from .frozen import frozen_class
+from .signals import pre_lock, post_lock
+
+
+def bulk_lock_field(model):
+    """The field lock() sets, raising TypeError for models that can't be locked that way"""
+    opts = model._meta
+    try:
+        lock_field = opts.get_field(opts.immutable_lock_field or '')
+    except FieldDoesNotExist:
+        lock_field = None
+    if lock_field is None or lock_field.primary_key or not isinstance(
+            lock_field, (models.BooleanField, models.NullBooleanField)):
+        raise TypeError('%s has no boolean immutable_lock_field to lock rows with' % model.__name__)
+    return lock_field
+
+
+def lock(queryset):
+    """
+    Lock every unlocked row of queryset with a single UPDATE, sending pre_lock
+    and post_lock (if anything listens) once for all of them.
+
+    With an immutable_fingerprint_field, the rows' fingerprints are stored by
+    the same UPDATE (one per batch of rows, where the database limits the
+    size of a query).
+
+    Returns the number of rows locked.
+    """
+    model = queryset.model
+    lock_field = bulk_lock_field(model)
+    fingerprint_field = model._meta.immutable_fingerprint_field
+    if not isinstance(queryset, ImmutableQuerySet):
+        queryset = ImmutableQuerySet(model, queryset.query.clone(), queryset.db)
+    unlocked = queryset.unlocked()
+    if fingerprint_field is None and not (pre_lock.has_listeners(model) or post_lock.has_listeners(model)):
+        return models.QuerySet.update(unlocked, **{lock_field.name: True})
+    with transaction.atomic(using=queryset.db):
+        if fingerprint_field is None:
+            pks = list(unlocked.values_list('pk', flat=True))
+        else:
+            fields = model._meta.immutable_fingerprinted_fields
+            rows = list(unlocked.values_list('pk', *[f.attname for f in fields]))
+            pks = [row[0] for row in rows]
+        if not pks:
+            return 0
+        pre_lock.send(sender=model, pks=pks, using=queryset.db)
+        if fingerprint_field is None:
+            count = models.QuerySet.update(unlocked, **{lock_field.name: True})
+        else:
+            count = 0
+            # each row takes 3 query parameters: pk and fingerprint, then pk again
+            batch_size = connections[queryset.db].ops.bulk_batch_size(['pk', fingerprint_field, 'pk'], rows)
+            for start in range(0, len(rows), batch_size):
+                batch = rows[start:start + batch_size]
+                fingerprints = Case(
+                    output_field=model._meta.get_field(fingerprint_field),
+                    *[When(pk=row[0], then=Value(fingerprint(model, row[1:]))) for row in batch])
+                count += models.QuerySet.update(unlocked.filter(pk__in=[row[0] for row in batch]), **{
+                    lock_field.name: True, fingerprint_field: fingerprints})
+        post_lock.send(sender=model, pks=pks, count=count, using=queryset.db)
+    return count
+
+
+def unlocked_filter(model, lock_field_name):
+    """
+    The filter matching rows of model whose immutable fields can still be
+    changed, None when no saved row can be, or UNDEFINED (from .models)
+    when the lock isn't a field of model.
+    """
+    from .models import UNDEFINED
+    if lock_field_name is None:
+        return None
+    try:
+        lock_field = model._meta.get_field(lock_field_name)
+    except FieldDoesNotExist:
+        return UNDEFINED
+    if lock_field.primary_key:
+        # every saved row has a primary key
+        return None
+    if isinstance(lock_field, (models.BooleanField, models.NullBooleanField)):
+        unlocked = Q(**{lock_field_name: False})
+        if lock_field.null:
+            unlocked |= Q(**{'%s__isnull' % lock_field_name: True})
+        return unlocked
+    return Q(**{'%s__isnull' % lock_field_name: True})
+
+
+class ImmutableQuerySet(models.QuerySet):
+    def _unlocked_filter(self):
+        """
+        The filter matching rows whose immutable fields can still be changed,
+        or None when no saved row can be.
+        """
+        from .models import UNDEFINED
+        unlocked = unlocked_filter(self.model, self.model._meta.immutable_lock_field)
+        if unlocked is UNDEFINED:
+            # eg. a property: can only be worked out row by row
+            return Q(pk__in=[obj.pk for obj in self if not obj.is_immutable()])
+        return unlocked
+
+    def get(self, *args, **kwargs):
+        """
+        Like QuerySet.get, but a lookup of a single primary key is answered
+        without a query when the model's instance caches have that row.
+        """
+        opts = self.model._meta
+        if opts.immutable_cache_instances and not args and len(kwargs) == 1 and self._is_plain():
+            lookup, value = list(kwargs.items())[0]
+            if lookup in ('pk', 'pk__exact', opts.pk.name, '%s__exact' % opts.pk.name, opts.pk.attname):
+                try:
+                    pk = opts.pk.to_python(value)
+                except Exception:
+                    pk = None
+                if pk is not None:
+                    found = cache.get_many(self.model, self.db, [pk])
+                    if found:
+                        return found[pk]
+                    obj = super(ImmutableQuerySet, self).get(*args, **kwargs)
+                    cache.remember([obj])
+                    return obj
+        return super(ImmutableQuerySet, self).get(*args, **kwargs)
+
+    def get_many(self, pks):
+        """
+        Like in_bulk: a dict of the instances with the given primary keys, but
+        taken from the model's instance caches where possible, so that only
+        the rest are selected from the database.
+        """
+        if not self.model._meta.immutable_cache_instances or not self._is_plain():
+            return self.in_bulk(pks)
+        to_python = self.model._meta.pk.to_python
+        pks = [to_python(pk) for pk in pks]
+        found = cache.get_many(self.model, self.db, pks)
+        missing = [pk for pk in pks if pk not in found]
+        if missing:
+            loaded = list(self.filter(pk__in=missing).order_by())
+            cache.remember(loaded)
+            found.update((obj.pk, obj) for obj in loaded)
+        return found
+
+    def frozen(self):
+        """
+        Iterate over the rows as FrozenInstances (hashable, read only tuples of
+        the field values) rather than model instances: much lighter to build
+        and to keep when reading many locked rows.
+        """
+        klass = frozen_class(self.model)
+        return (klass(row) for row in self.values_list(*klass._fields).iterator())
+
+    def _is_plain(self):
+        # all rows, all fields, no extras: what from_db gives the cache
+        query = self.query
+        return not (query.where or query.low_mark or query.high_mark or query.deferred_loading[0] or
+                    query.select_related or query.extra or query.annotations or query.select_for_update or
+                    self._prefetch_related_lookups or getattr(self, '_fields', None) is not None)
+
+    def unlocked(self):
+        unlocked = self._unlocked_filter()
+        if unlocked is None:
+            return self.none()
+        return self.filter(unlocked)
+
+    def locked(self):
+        unlocked = self._unlocked_filter()
+        if unlocked is None:
+            return self.all()
+        return self.exclude(unlocked)
+
+    def update(self, **kwargs):
+        """
+        Update rows in a single statement, like QuerySet.update, but only
+        change immutable fields on unlocked rows: locked rows are left out
+        (or ValueError is raised, when immutable_quiet is off).
+        """
+        opts = self.model._meta
+        if opts.immutable_cache_instances:
+            cache.invalidate(self.model)
+        guarded = sorted(name for name in kwargs if name not in opts.immutable_mutable_names)
+        if not guarded:
+            return super(ImmutableQuerySet, self).update(**kwargs)
+        if not opts.immutable_quiet:
+            with transaction.atomic(using=self.db):
+                if self.locked().exists():
+                    raise ValueError('%s.%s is immutable and cannot be changed' % (self.model.__name__, guarded[0]))
+                return self._update_unlocked(kwargs)
+        return self._update_unlocked(kwargs)
+    update.alters_data = True
+
+    def delete(self):
+        """
+        Delete rows like QuerySet.delete, but when immutable_is_deletable is off
+        leave locked rows in place (or raise CantDeleteImmutableException, when
+        immutable_quiet is off).
+
+        Returns the number of rows that were protected from deletion.
+        """
+        opts = self.model._meta
+        if opts.immutable_is_deletable:
+            super(ImmutableQuerySet, self).delete()
+            return 0
+        with transaction.atomic(using=self.db):
+            if opts.immutable_quiet:
+                protected = self.locked().count()
+            elif self.locked().exists():
+                from .models import CantDeleteImmutableException
+                raise CantDeleteImmutableException(
+                    "%s contains immutable rows which cannot be deleted" % self.model.__name__
+                )
+            else:
+                protected = 0
+            unlocked = self.unlocked()
+            if not unlocked.query.is_empty():
+                super(ImmutableQuerySet, unlocked).delete()
+        return protected
+    delete.alters_data = True
+    delete.queryset_only = True
+
+    def lock(self):
+        """Lock the unlocked rows in a single UPDATE, see query.lock"""
+        return lock(self)
+    lock.alters_data = True
+
+    # awaitable versions: see immutablemodel.asynchronous
+
+    def alock(self):
+        return run_in_thread(self.lock)
+    alock.alters_data = True
+
+    def aupdate(self, **kwargs):
+        return run_in_thread(self.update, **kwargs)
+    aupdate.alters_data = True
+
+    def adelete(self):
+        return run_in_thread(self.delete)
+    adelete.alters_data = True
+    adelete.queryset_only = True
+
+    def _update_unlocked(self, values):
+        unlocked = self.unlocked()
+        if unlocked.query.is_empty():
+            return 0
+        return super(ImmutableQuerySet, unlocked).update(**values)
+
+
+class ImmutableManager(models.Manager.from_queryset(ImmutableQuerySet)):
+    def lock(self, queryset=None):
+        """Lock the unlocked rows of queryset (by default: all of them), see query.lock"""
+        return lock(self.get_queryset() if queryset is None else queryset)
+    lock.alters_data = True
+
+    def alock(self, queryset=None):
+        return run_in_thread(self.lock, queryset)
+    alock.alters_data = True
@@ -0,0 +1,11 @@
+# encoding: utf-8
+from django.dispatch import Signal
+
+# sent once for all the rows locked together by ImmutableQuerySet.lock()
+pre_lock = Signal(providing_args=['pks', 'using'])
+post_lock = Signal(providing_args=['pks', 'count', 'using'])
+
+# sent when a change to an immutable field, or deleting an immutable
+# instance, is refused (whether quietly or by raising)
+immutable_write_blocked = Signal(providing_args=['instance', 'name', 'value'])
+immutable_delete_blocked = Signal(providing_args=['instance'])
@@ -0,0 +1,227 @@
+# encoding: utf-8
+"""
+Database triggers enforcing an ImmutableModel's options for every UPDATE and
+DELETE of its table, including raw SQL and other processes that never see
+the Python side checks.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+from django.db.backends.utils import truncate_name
+from django.utils import six
+from django.utils.encoding import force_text
+
+SQLITE_UPDATE = """CREATE TRIGGER {trigger} {when} UPDATE OF {columns} ON {table}
+FOR EACH ROW WHEN {locked} AND ({changed})
+BEGIN
+    {action};
+END"""
+
+SQLITE_DELETE = """CREATE TRIGGER {trigger} BEFORE DELETE ON {table}
+FOR EACH ROW WHEN {locked}
+BEGIN
+    SELECT RAISE({action});
+END"""
+
+POSTGRESQL_FUNCTION = """CREATE OR REPLACE FUNCTION {trigger}() RETURNS trigger AS $$
+BEGIN
+    IF {locked} THEN
+        {action}
+    END IF;
+    RETURN {returning};
+END;
+$$ LANGUAGE plpgsql"""
+
+POSTGRESQL_TRIGGER = """CREATE TRIGGER {trigger} BEFORE {event} ON {table}
+FOR EACH ROW EXECUTE PROCEDURE {trigger}()"""
+
+POSTGRESQL_RAISE = "RAISE EXCEPTION '{message}' USING ERRCODE = 'integrity_constraint_violation';"
+
+TRUE = {'sqlite': '1', 'postgresql': 'TRUE'}
+BOOLEAN_TRUE = {'sqlite': '%s = 1', 'postgresql': '%s IS TRUE'}
+
+
+def trigger_options(model):
+    """
+    The options the triggers for model's table are made from, as plain
+    values: a migration can keep them, so that it doesn't depend on the model
+    (or its Meta) as it is when the migration is run.
+    """
+    opts = model._meta
+    guarded = guarded_columns(model)
+    lock_column, lock_is_boolean = _lock_column(model)
+    options = {
+        'db_table': force_text(opts.db_table),
+        'pk_column': force_text(opts.pk.column),
+        'guarded_columns': [force_text(f.column) for f in guarded],
+        # mirrors ImmutableModel.changes_loaded_value: empty values can be filled in
+        'text_columns': [force_text(f.column) for f in guarded
+                         if isinstance(f, (models.CharField, models.TextField, models.FileField))],
+        'lock_column': None if lock_column is None else force_text(lock_column),
+        'lock_is_boolean': lock_is_boolean,
+        'quiet': bool(opts.immutable_quiet),
+        'deletable': bool(opts.immutable_is_deletable),
+    }
+    # all text, as migrations are written with unicode_literals
+    return dict((force_text(key), value) for key, value in options.items())
+
+
+def trigger_names(db_table, connection):
+    max_length = connection.ops.max_name_length()
+    return (
+        truncate_name('immutable_%s_update' % db_table, max_length),
+        truncate_name('immutable_%s_delete' % db_table, max_length),
+    )
+
+
+def guarded_columns(model):
+    opts = model._meta
+    guarded = set(opts.immutable_guarded_fields.values())
+    return [f for f in opts.local_concrete_fields if f in guarded]
+
+
+def _options(model):
+    return model if isinstance(model, dict) else trigger_options(model)
+
+
+def create_trigger_sql(model, connection):
+    """The statements creating the triggers for model's table (or trigger_options) on connection"""
+    options = _options(model)
+    if connection.vendor == 'sqlite':
+        return _sqlite_create_sql(options, connection)
+    if connection.vendor == 'postgresql':
+        return _postgresql_create_sql(options, connection)
+    raise NotImplementedError('Immutability triggers are not available for %s' % connection.vendor)
+
+
+def drop_trigger_sql(model, connection):
+    """The statements removing the triggers for model's table (or trigger_options, or db_table) on connection"""
+    if isinstance(model, six.string_types):
+        db_table = model
+    else:
+        db_table = _options(model)['db_table']
+    qn = connection.ops.quote_name
+    update_trigger, delete_trigger = trigger_names(db_table, connection)
+    if connection.vendor == 'sqlite':
+        return ['DROP TRIGGER IF EXISTS %s' % qn(name) for name in (update_trigger, delete_trigger)]
+    if connection.vendor == 'postgresql':
+        statements = []
+        for name in (update_trigger, delete_trigger):
+            statements.append('DROP TRIGGER IF EXISTS %s ON %s' % (qn(name), qn(db_table)))
+            statements.append('DROP FUNCTION IF EXISTS %s()' % qn(name))
+        return statements
+    raise NotImplementedError('Immutability triggers are not available for %s' % connection.vendor)
+
+
+def _lock_column(model):
+    """The lock field's column (None when every row is locked) and whether it's a boolean"""
+    opts = model._meta
+    lock_field_name = opts.immutable_lock_field
+    if lock_field_name is None:
+        return None, False
+    try:
+        lock_field = opts.get_field(lock_field_name)
+    except FieldDoesNotExist:
+        raise ValueError('immutable_lock_field %s of %s is not a database column' % (lock_field_name, model))
+    if lock_field.primary_key:
+        # every saved row has a primary key
+        return None, False
+    if lock_field not in opts.local_concrete_fields:
+        raise ValueError('immutable_lock_field %s of %s is not a column of %s' % (
+            lock_field_name, model, opts.db_table))
+    return lock_field.column, isinstance(lock_field, (models.BooleanField, models.NullBooleanField))
+
+
+def _locked_sql(options, qn, vendor):
+    """The condition under which the OLD row is immutable"""
+    if options['lock_column'] is None:
+        return TRUE[vendor]
+    column = 'OLD.%s' % qn(options['lock_column'])
+    if options['lock_is_boolean']:
+        return BOOLEAN_TRUE[vendor] % column
+    return '%s IS NOT NULL' % column
+
+
+def _protected_sql(options, column, qn):
+    old = 'OLD.%s' % qn(column)
+    protected = '%s IS NOT NULL' % old
+    if column in options['text_columns']:
+        protected += " AND %s <> ''" % old
+    return protected
+
+
+def _message(options, verb):
+    return '%s is immutable and cannot be %s' % (options['db_table'], verb)
+
+
+def _sqlite_create_sql(options, connection):
+    qn = connection.ops.quote_name
+    table = options['db_table']
+    update_trigger, delete_trigger = trigger_names(table, connection)
+    locked = _locked_sql(options, qn, connection.vendor)
+    statements = []
+    columns = options['guarded_columns']
+    if columns:
+        changed = ' OR '.join(
+            '(%s AND OLD.%s IS NOT NEW.%s)' % (_protected_sql(options, c, qn), qn(c), qn(c))
+            for c in columns
+        )
+        if options['quiet']:
+            # sqlite can't alter NEW, so put the protected values back afterwards
+            # (found by the NEW primary key, as it may be one of them)
+            when = 'AFTER'
+            action = 'UPDATE %s SET %s WHERE %s = NEW.%s' % (
+                qn(table),
+                ', '.join('%s = CASE WHEN %s THEN OLD.%s ELSE NEW.%s END' % (
+                    qn(c), _protected_sql(options, c, qn), qn(c), qn(c)) for c in columns),
+                qn(options['pk_column']), qn(options['pk_column']),
+            )
+        else:
+            when = 'BEFORE'
+            action = "SELECT RAISE(ABORT, '%s')" % _message(options, 'changed')
+        statements.append(SQLITE_UPDATE.format(
+            trigger=qn(update_trigger), when=when, table=qn(table),
+            columns=', '.join(qn(c) for c in columns),
+            locked=locked, changed=changed, action=action,
+        ))
+    if not options['deletable']:
+        statements.append(SQLITE_DELETE.format(
+            trigger=qn(delete_trigger), table=qn(table), locked=locked,
+            action='IGNORE' if options['quiet'] else "ABORT, '%s'" % _message(options, 'deleted'),
+        ))
+    return statements
+
+
+def _postgresql_create_sql(options, connection):
+    qn = connection.ops.quote_name
+    table = options['db_table']
+    update_trigger, delete_trigger = trigger_names(table, connection)
+    locked = _locked_sql(options, qn, connection.vendor)
+    statements = []
+    columns = options['guarded_columns']
+    if columns:
+        actions = []
+        for c in columns:
+            if options['quiet']:
+                action = 'NEW.%s := OLD.%s;' % (qn(c), qn(c))
+            else:
+                action = POSTGRESQL_RAISE.format(message=_message(options, 'changed'))
+            actions.append('IF %s AND OLD.%s IS DISTINCT FROM NEW.%s THEN %s END IF;' % (
+                _protected_sql(options, c, qn), qn(c), qn(c), action))
+        statements.append(POSTGRESQL_FUNCTION.format(
+            trigger=qn(update_trigger), locked=locked,
+            action='\n        '.join(actions), returning='NEW',
+        ))
+        statements.append(POSTGRESQL_TRIGGER.format(
+            trigger=qn(update_trigger), event='UPDATE', table=qn(table),
+        ))
+    if not options['deletable']:
+        statements.append(POSTGRESQL_FUNCTION.format(
+            trigger=qn(delete_trigger), locked=locked,
+            action='RETURN NULL;' if options['quiet'] else POSTGRESQL_RAISE.format(
+                message=_message(options, 'deleted')),
+            returning='OLD',
+        ))
+        statements.append(POSTGRESQL_TRIGGER.format(
+            trigger=qn(delete_trigger), event='DELETE', table=qn(table),
+        ))
+    return statements
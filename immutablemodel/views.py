@@ -0,0 +1,134 @@
+# encoding: utf-8
+"""
+Responses about a locked object can't go out of date, so they can be cached
+for good: cache_if_locked (for view functions) and CacheIfLockedMixin (for
+class based views) send them with "Cache-Control: private, max-age=...,
+immutable" (public only when asked for) and the object's fingerprint as a
+strong ETag, and answer a matching If-None-Match with 304 Not Modified.
+Unlocked objects are left to the view.
+
+The view's own checks come first: the decorator only looks at the ETag of
+a 200 response the view made, and the mixin only once its dispatch() and
+get_object() have found the object.
+
+Only use them for responses made from the immutable fields of the object:
+the mutable fields can still change once it's locked.
+"""
+from functools import wraps
+
+from django.http import HttpResponseNotModified
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags, quote_etag
+
+from .fingerprint import fingerprint
+from .query import ImmutableQuerySet
+
+# a year: about as long as caches will keep anything
+DEFAULT_MAX_AGE = 60 * 60 * 24 * 365
+
+
+def get_max_age():
+    from django.conf import settings
+    return getattr(settings, 'IMMUTABLE_HTTP_MAX_AGE', DEFAULT_MAX_AGE)
+
+
+def locked_etag(queryset, **lookup):
+    """
+    The strong ETag of the locked row of queryset (or model) matching lookup,
+    or None if there's none. Only the fingerprint (or the fields it's made
+    from) is selected, rather than the whole row.
+    """
+    if not hasattr(queryset, 'model'):
+        queryset = queryset._default_manager.all()
+    model = queryset.model
+    if not isinstance(queryset, ImmutableQuerySet):
+        queryset = ImmutableQuerySet(model, queryset.query.clone(), queryset.db)
+    opts = model._meta
+    rows = queryset.locked().filter(**lookup)
+    if opts.immutable_fingerprint_field is not None:
+        stored = list(rows.values_list(opts.get_field(opts.immutable_fingerprint_field).attname, flat=True)[:1])
+        if not stored:
+            return None
+        if stored[0]:
+            return quote_etag(stored[0])
+        # locked some way that didn't fill it in
+    values = list(rows.values_list(*[f.attname for f in opts.immutable_fingerprinted_fields])[:1])
+    if not values:
+        return None
+    return quote_etag(fingerprint(model, values[0]))
+
+
+def respond_if_locked(request, etag, get_response, max_age=None, public=False):
+    """
+    The response to request, given the etag of the object it's about (None
+    unless the object is locked and found): 304 when the client has it,
+    otherwise get_response() - made cacheable for good when there's an etag.
+    """
+    if etag is None or request.method not in ('GET', 'HEAD'):
+        return get_response()
+    if max_age is None:
+        max_age = get_max_age()
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    # (the object exists, so "*" matches too)
+    if if_none_match and (if_none_match.strip() == '*' or etag in [quote_etag(e) for e in parse_etags(if_none_match)]):
+        response = HttpResponseNotModified()
+    else:
+        response = get_response()
+        if response.status_code != 200:
+            return response
+    response['ETag'] = etag
+    patch_cache_control(response, max_age=max_age, immutable=True, **{'public' if public else 'private': True})
+    return response
+
+
+def cache_if_locked(queryset, lookup_field='pk', url_kwarg=None, max_age=None, public=False):
+    """
+    Decorate a view of one object of queryset (or of a model), found by
+    lookup_field from the url keyword argument url_kwarg (lookup_field, by
+    default), so that its responses are cached for good once it's locked::
+
+        @cache_if_locked(CruiseShip)
+        def ship(request, pk):
+            ...
+
+    The view is still called (and so still checks permissions, and finds
+    the object, its own way): the ETag is looked up once it has answered
+    200, and a matching If-None-Match saves sending the response. Only with
+    public=True may shared caches keep it.
+    """
+    url_kwarg = url_kwarg or lookup_field
+
+    def decorator(view):
+        @wraps(view)
+        def cached_view(request, *args, **kwargs):
+            response = view(request, *args, **kwargs)
+            if request.method not in ('GET', 'HEAD') or url_kwarg not in kwargs or response.status_code != 200:
+                return response
+            etag = locked_etag(queryset, **{lookup_field: kwargs[url_kwarg]})
+            return respond_if_locked(request, etag, lambda: response, max_age, public)
+        return cached_view
+    return decorator
+
+
+class CacheIfLockedMixin(object):
+    """
+    For detail views (SingleObjectMixin, with get_object and
+    render_to_response): responses about a locked object are cached for
+    good. The object is found by get_object(), after the view's dispatch()
+    (and any permission checks there), and a matching If-None-Match is
+    answered before the response is rendered.
+    """
+    immutable_max_age = None
+    immutable_public = False
+
+    def get_locked_etag(self):
+        if not self.object.is_immutable():
+            return None
+        return quote_etag(self.object.immutable_fingerprint)
+
+    def get(self, request, *args, **kwargs):
+        self.object = self.get_object()
+        return respond_if_locked(
+            request, self.get_locked_etag(),
+            lambda: self.render_to_response(self.get_context_data(object=self.object)),
+            self.immutable_max_age, self.immutable_public)
@@ -23,7 +23,7 @@ setup(
     author='Rob Madole, Helder Silva, Tim Diggins',
     author_email='tim@red56.co.uk',
     url='https://github.com/red56/django-immutablemodel',
-    packages = [ 'immutablemodel' ],
+    packages = [ 'immutablemodel', 'immutablemodel.management', 'immutablemodel.management.commands' ],
     zip_safe=False,
     entry_points={}
 )
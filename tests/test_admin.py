@@ -0,0 +1,148 @@
+# encoding: utf-8
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.urlresolvers import reverse
+from django.core.signals import request_started
+from django.db import connection, reset_queries
+from django.test import TestCase
+from django.test.client import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from immutablemodel.admin import ImmutableModelAdmin
+
+from .testapp.models import SimpleLockField, SimpleNoLockField, NotDeletableLockField, ComplexAdminModel, Reference
+
+
+class Case01_ImmutableModelAdminTest(TestCase):
+    def setUp(self):
+        self.model_admin = admin.site._registry[SimpleLockField]
+        self.request = RequestFactory().get('/')
+        self.unlocked = SimpleLockField.objects.create(special_id=1, name='Yoda', is_locked=False)
+        self.locked = SimpleLockField.objects.create(special_id=2, name='Yoda', is_locked=True)
+
+    def test01_readonly_fields(self):
+        self.assertEqual((), self.model_admin.get_readonly_fields(self.request))
+        self.assertEqual(('is_locked',), self.model_admin.get_readonly_fields(self.request, self.unlocked))
+        self.assertEqual(('special_id',), self.model_admin.get_readonly_fields(self.request, self.locked))
+
+    def test02_lock_state_is_fetched_once_per_request(self):
+        with self.assertNumQueries(1):
+            for i in range(3):
+                self.model_admin.get_readonly_fields(self.request, self.locked)
+        with self.assertNumQueries(1):
+            self.model_admin.get_readonly_fields(RequestFactory().get('/'), self.locked)
+
+    def test03_readonly_fields_follow_the_database(self):
+        SimpleLockField.objects.filter(pk=self.unlocked.pk).update(is_locked=True)
+        self.assertEqual(('special_id',), self.model_admin.get_readonly_fields(self.request, self.unlocked))
+
+    def test04_has_delete_permission(self):
+        self.request.user = User(is_superuser=True, is_active=True)
+        self.assertTrue(self.model_admin.has_delete_permission(self.request))
+        self.assertTrue(self.model_admin.has_delete_permission(self.request, self.locked))
+        model_admin = admin.site._registry[NotDeletableLockField]
+        unlocked = NotDeletableLockField.objects.create(special_id=1)
+        locked = NotDeletableLockField.objects.create(special_id=2, is_locked=True)
+        self.assertTrue(model_admin.has_delete_permission(self.request, unlocked))
+        self.assertFalse(model_admin.has_delete_permission(self.request, locked))
+
+    def test05_lock_action_only_offered_with_a_boolean_lock_field(self):
+        self.request.user = User(is_superuser=True, is_active=True)
+        self.assertIn('lock_selected', self.model_admin.get_actions(self.request))
+        model_admin = ImmutableModelAdmin(SimpleNoLockField, admin.site)
+        self.assertNotIn('lock_selected', model_admin.get_actions(self.request))
+
+
+class Case02_AdminViewsTest(TestCase):
+    def setUp(self):
+        User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.login(username='admin', password='password')
+        self.obj = SimpleLockField.objects.create(special_id=1, name='Yoda', is_locked=True)
+        # or the queries captured during a request are forgotten as it starts
+        request_started.disconnect(reset_queries)
+
+    def tearDown(self):
+        request_started.connect(reset_queries)
+
+    def selects_from(self, queries, table):
+        return [q for q in queries if ('SELECT "%s"' % table) in q['sql']]
+
+    def test01_change_view_queries(self):
+        url = reverse('admin:testapp_simplelockfield_change', args=(self.obj.pk,))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(200, response.status_code)
+        # one to get the object, one for its lock field
+        self.assertEqual(2, len(self.selects_from(queries, 'testapp_simplelockfield')))
+
+    def test02_post_to_change_view_keeps_immutable_fields(self):
+        url = reverse('admin:testapp_simplelockfield_change', args=(self.obj.pk,))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, {'name': 'Obi-Wan', 'special_id': 1337, 'is_locked': 'on'})
+        self.assertEqual(302, response.status_code)
+        self.assertEqual(2, len(self.selects_from(queries, 'testapp_simplelockfield')))
+        db_object = SimpleLockField.objects.get(pk=self.obj.pk)
+        self.assertEqual('Obi-Wan', db_object.name)
+        self.assertEqual(1, db_object.special_id)
+
+    def test03_profiling_middleware(self):
+        url = reverse('admin:testapp_simplelockfield_change', args=(self.obj.pk,))
+        middleware = list(settings.MIDDLEWARE_CLASSES) + ['immutablemodel.profiling.ImmutableGuardProfilingMiddleware']
+        with self.settings(MIDDLEWARE_CLASSES=middleware):
+            response = self.client.get(url)
+        profile = response.wsgi_request.immutable_guard_profile
+        counts = profile.models[SimpleLockField]
+        self.assertEqual(1, counts['get_lock_state']['calls'])
+        self.assertEqual(1, len(counts['queries']))
+
+    def test04_lock_selected_action(self):
+        unlocked = SimpleLockField.objects.create(special_id=2, name='Yoda', is_locked=False)
+        url = reverse('admin:testapp_simplelockfield_changelist')
+        response = self.client.post(url, {
+            'action': 'lock_selected',
+            '_selected_action': [self.obj.pk, unlocked.pk],
+        })
+        self.assertEqual(302, response.status_code)
+        self.assertTrue(SimpleLockField.objects.get(pk=unlocked.pk).is_locked)
+
+
+class Case03_ComplexImmutableModelAdminTest(TestCase):
+    def setUp(self):
+        User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.login(username='admin', password='password')
+        self.references = [Reference.objects.create(name='Reference %s' % i) for i in range(5)]
+        self.obj = ComplexAdminModel.objects.create(name='Yoda', is_locked=True)
+        self.obj.references.add(*self.references)
+        self.url = reverse('admin:testapp_complexadminmodel_change', args=(self.obj.pk,))
+        request_started.disconnect(reset_queries)
+
+    def tearDown(self):
+        request_started.connect(reset_queries)
+
+    def test01_save_as_new_starts_from_the_original(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, {'_saveasnew': 'Save as new', 'name': 'Obi-Wan'})
+        self.assertEqual(200, response.status_code)
+        initial = response.context['adminform'].form.initial
+        self.assertEqual('Yoda', initial['name'])
+        self.assertEqual(sorted(r.pk for r in self.references), sorted(initial['references']))
+        self.assertFalse('is_locked' in initial)
+        # the related primary keys come from the join table alone
+        through_queries = [q for q in queries if 'testapp_complexadminmodel_references' in q['sql']]
+        self.assertEqual(1, len(through_queries))
+        self.assertFalse('"testapp_reference"."name"' in through_queries[0]['sql'])
+        self.assertEqual(1, ComplexAdminModel.objects.count())
+
+    def test02_lock_checkbox_is_disabled_once_locked(self):
+        response = self.client.get(self.url)
+        self.assertEqual(200, response.status_code)
+        widget = response.context['adminform'].form.fields['immutable_lock'].widget
+        self.assertTrue(widget.attrs.get('disabled'))
+
+    def test03_can_lock_with_checkbox(self):
+        obj = ComplexAdminModel.objects.create(name='Yoda')
+        url = reverse('admin:testapp_complexadminmodel_change', args=(obj.pk,))
+        response = self.client.post(url, {'name': 'Yoda', 'references': [self.references[0].pk], 'immutable_lock': 'on'})
+        self.assertEqual(302, response.status_code)
+        self.assertTrue(ComplexAdminModel.objects.get(pk=obj.pk).is_locked)
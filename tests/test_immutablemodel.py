@@ -1,8 +1,27 @@
 # encoding: utf-8
-from django.test import TestCase
+import pickle
+import shutil
+import tempfile
+from unittest import skipUnless
+
+from django.apps.registry import Apps
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection, models, transaction, IntegrityError
+from django.test import TestCase, TransactionTestCase
+from django.utils import six
+from django.test.utils import CaptureQueriesContext
+from django.utils.six import StringIO
 
 from .testapp.models import *
-from immutablemodel.models import CantDeleteImmutableException
+from immutablemodel.cache import instance_cache
+from immutablemodel.fingerprint import fingerprint
+from immutablemodel.models import ImmutableModel, CantDeleteImmutableException
+from immutablemodel.operations import CreateImmutableTriggers, DropImmutableTriggers
+from immutablemodel.query import ImmutableQuerySet
+from immutablemodel import instrumentation
+from immutablemodel.profiling import GuardProfile
+from immutablemodel.signals import pre_lock, post_lock, immutable_write_blocked, immutable_delete_blocked
 
 class Case01_NoMetaTest(TestCase):
     def setUp(self):
@@ -421,3 +440,1191 @@ class Case07_InheritenceTests(TestCase):
             self.assertEqual(t.child_field, "child", "expecting %s.child_field" % name)
             self.assertEqual(t.special_id, 1, "expecting %s.special_id" % name)
             self.assertEqual(t.mutable_field, "other", "expecting %s.mutable_field" % name)
+
+class Case08_CompiledFieldTablesTest(TestCase):
+
+    def test01_mutable_names_include_attnames_and_underscored_fields(self):
+        self.assertTrue('name' in HavingMutableField._meta.immutable_mutable_names)
+        self.assertFalse('special_id' in HavingMutableField._meta.immutable_mutable_names)
+        self.assertTrue('_something_mutable' in HavingUnderscoredField._meta.immutable_mutable_names)
+
+    def test02_guarded_fields_are_looked_up_by_name_and_attname(self):
+        guarded = ComplexLockField._meta.immutable_guarded_fields
+        self.assertEqual(set(['special_id']), set(guarded))
+        self.assertEqual('special_id', guarded['special_id'].name)
+
+class Case09_GuardFreeConstructionTest(TestCase):
+    def setUp(self):
+        ComplexLockField.objects.create(is_locked=True, special_id=1, name='Yoda')
+        self.calls = []
+        self.original = ImmutableModel.can_change_field
+        calls = self.calls
+        original = self.original
+        def counting_can_change_field(obj, field_name):
+            calls.append(field_name)
+            return original(obj, field_name)
+        ImmutableModel.can_change_field = counting_can_change_field
+
+    def tearDown(self):
+        ImmutableModel.can_change_field = self.original
+
+    def test01_loading_from_db_is_not_guarded(self):
+        obj = ComplexLockField.objects.all()[0]
+        self.assertEqual([], self.calls)
+        self.assertEqual(1, obj.special_id)
+
+    def test02_guard_is_on_once_built(self):
+        obj = ComplexLockField.objects.all()[0]
+        obj.special_id = 1337
+        self.assertEqual(['special_id'], self.calls)
+        self.assertEqual(1, obj.special_id)
+
+    def test03_loaded_as_if_constructed(self):
+        obj = ComplexLockField.objects.all()[0]
+        constructed = models.Model.from_db.__func__(ComplexLockField, 'default', ['id', 'is_locked', 'special_id', 'name'],
+                                                     [obj.pk, True, 1, 'Yoda'])
+        self.assertEqual(dict((k, v) for k, v in constructed.__dict__.items() if k != '_state'),
+                         dict((k, v) for k, v in obj.__dict__.items() if k != '_state'))
+        self.assertEqual(('default', False), (obj._state.db, obj._state.adding))
+        self.assertEqual((1, 'Yoda'), (ComplexLockField.objects.only('name')[0].special_id,
+                                       ComplexLockField.objects.defer('name')[0].name))
+
+    def test04_init_signals_still_sent(self):
+        from django.db.models.signals import post_init
+        initialised = []
+
+        def receiver(sender, instance, **kwargs):
+            initialised.append(instance.special_id)
+        post_init.connect(receiver, sender=ComplexLockField)
+        try:
+            ComplexLockField.objects.all()[0]
+        finally:
+            post_init.disconnect(receiver, sender=ComplexLockField)
+        self.assertEqual([1], initialised)
+
+class Case10_NoHiddenQueriesTest(TestCase):
+    def setUp(self):
+        self.reference = Reference.objects.create(name='Tatooine')
+        self.other_reference = Reference.objects.create(name='Dagobah')
+        self.obj = HavingForeignKey.objects.create(reference=self.reference, special_id=1, name='Luke')
+
+    def test01_assigning_deferred_field_issues_no_query(self):
+        obj = HavingForeignKey.objects.only('name').get(pk=self.obj.pk)
+        with self.assertNumQueries(0):
+            obj.special_id = 1337
+        self.assertEqual(1, obj.special_id)
+
+    def test02_deferred_instances_keep_their_options(self):
+        obj = HavingForeignKey.objects.defer('name').get(pk=self.obj.pk)
+        with self.assertNumQueries(0):
+            obj.name = 'Vader'
+        self.assertEqual('Vader', obj.name)
+
+    def test03_assigning_foreign_key_issues_no_query(self):
+        obj = HavingForeignKey.objects.get(pk=self.obj.pk)
+        with self.assertNumQueries(0):
+            obj.reference = self.other_reference
+            obj.reference_id = self.other_reference.pk
+        self.assertEqual(self.reference.pk, obj.reference_id)
+
+    def test04_can_assign_same_foreign_key(self):
+        obj = HavingForeignKey.objects.get(pk=self.obj.pk)
+        with self.assertNumQueries(0):
+            obj.reference = self.reference
+        self.assertEqual(self.reference, obj.reference)
+
+class Case11_DescriptorsTest(TestCase):
+    def setUp(self):
+        self.reference = Reference.objects.create(name='Tatooine')
+        self.other_reference = Reference.objects.create(name='Dagobah')
+        self.obj = DescriptorLockField.objects.create(
+            is_locked=True, special_id=1, name='Yoda', reference=self.reference,
+        )
+
+    def test01_only_guarded_fields_have_descriptors(self):
+        self.assertTrue(DescriptorLockField.__setattr__ is object.__setattr__)
+        self.assertFalse('name' in DescriptorLockField.__dict__)
+        self.assertTrue('special_id' in DescriptorLockField.__dict__)
+
+    def test02_can_change_mutable_fields(self):
+        self.obj.name = 'Obi-Wan'
+        self.obj.save()
+        self.assertEqual('Obi-Wan', DescriptorLockField.objects.get(pk=self.obj.pk).name)
+
+    def test03_cant_change_guarded_fields_once_locked(self):
+        self.obj.special_id = 1337
+        self.obj.reference = self.other_reference
+        self.obj.save()
+        db_object = DescriptorLockField.objects.get(pk=self.obj.pk)
+        for t, name in [(self.obj, 'obj'), (db_object, 'db_object')]:
+            self.assertEqual(1, t.special_id, "expecting %s.special_id" % name)
+            self.assertEqual(self.reference, t.reference, "expecting %s.reference" % name)
+
+    def test04_can_change_guarded_fields_when_unlocked(self):
+        obj = DescriptorLockField(special_id=1, name='Yoda')
+        obj.save()
+        obj.special_id = 1337
+        self.assertEqual(1337, obj.special_id)
+
+    def test05_cant_change_deferred_guarded_field(self):
+        obj = DescriptorLockField.objects.only('name', 'is_locked').get(pk=self.obj.pk)
+        with self.assertNumQueries(0):
+            obj.special_id = 1337
+        self.assertEqual(1, obj.special_id)
+
+    def test06_noisy_raises_and_can_still_delete(self):
+        obj = NoisyDescriptors.objects.create(special_id=1)
+        self.assertRaises(ValueError, setattr, obj, 'special_id', 1337)
+        obj_id = obj.id
+        obj.delete()
+        self.assertFalse(NoisyDescriptors.objects.filter(pk=obj_id).exists())
+
+class Case12_QuerySetUpdateTest(TestCase):
+    def setUp(self):
+        self.unlocked = SimpleLockField.objects.create(special_id=1, name='Yoda', is_locked=False)
+        self.locked = SimpleLockField.objects.create(special_id=2, name='Yoda', is_locked=True)
+
+    def test01_updates_mutable_fields_of_all_rows(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(2, SimpleLockField.objects.update(name='Obi-Wan'))
+        self.assertEqual(2, SimpleLockField.objects.filter(name='Obi-Wan').count())
+
+    def test02_updates_immutable_fields_of_unlocked_rows_only(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(1, SimpleLockField.objects.update(special_id=1337))
+        self.assertEqual(1337, SimpleLockField.objects.get(pk=self.unlocked.pk).special_id)
+        self.assertEqual(2, SimpleLockField.objects.get(pk=self.locked.pk).special_id)
+
+    def test03_locked_and_unlocked(self):
+        self.assertEqual([self.unlocked.pk], list(SimpleLockField.objects.unlocked().values_list('pk', flat=True)))
+        self.assertEqual([self.locked.pk], list(SimpleLockField.objects.locked().values_list('pk', flat=True)))
+
+    def test04_saved_rows_are_locked_by_primary_key(self):
+        NoMeta.objects.create(name='Vader')
+        with self.assertNumQueries(0):
+            self.assertEqual(0, NoMeta.objects.update(name='Anakin'))
+        self.assertEqual('Vader', NoMeta.objects.get().name)
+
+    def test05_noisy_raises_when_any_row_is_locked(self):
+        unlocked = NoisyLockField.objects.create(special_id=1)
+        NoisyLockField.objects.create(special_id=2, is_locked=True)
+        self.assertRaises(ValueError, NoisyLockField.objects.update, special_id=1337)
+        self.assertEqual(1, NoisyLockField.objects.get(pk=unlocked.pk).special_id)
+        self.assertEqual(1, NoisyLockField.objects.filter(pk=unlocked.pk).update(special_id=1337))
+
+    def test06_keeps_managers_declared_on_the_model(self):
+        self.assertTrue(type(HavingOwnManager._default_manager) is models.Manager)
+        self.assertTrue(isinstance(HavingOwnManager.objects.all(), ImmutableQuerySet))
+
+class Case13_QuerySetDeleteTest(TestCase):
+    def test01_deletes_deletable_rows(self):
+        SimpleLockField.objects.create(special_id=1, name='Yoda', is_locked=True)
+        self.assertEqual(0, SimpleLockField.objects.all().delete())
+        self.assertFalse(SimpleLockField.objects.exists())
+
+    def test02_keeps_locked_rows_when_not_deletable(self):
+        NotDeletableLockField.objects.create(special_id=1)
+        locked = NotDeletableLockField.objects.create(special_id=2, is_locked=True)
+        self.assertEqual(1, NotDeletableLockField.objects.all().delete())
+        self.assertEqual([locked.pk], list(NotDeletableLockField.objects.values_list('pk', flat=True)))
+
+    def test03_saved_rows_are_locked_by_primary_key(self):
+        QuietNotDeletable.objects.create(special_id=1)
+        QuietNotDeletable.objects.create(special_id=2)
+        self.assertEqual(2, QuietNotDeletable.objects.all().delete())
+        self.assertEqual(2, QuietNotDeletable.objects.count())
+
+    def test04_noisy_raises_when_any_row_is_locked(self):
+        NoisyNotDeletable.objects.create(special_id=1)
+        self.assertRaises(CantDeleteImmutableException, NoisyNotDeletable.objects.all().delete)
+        self.assertEqual(1, NoisyNotDeletable.objects.count())
+
+@skipUnless(connection.vendor == 'sqlite', 'triggers are tested on sqlite')
+class Case14_DatabaseTriggersTest(TestCase):
+    def create_triggers(self, model):
+        with connection.schema_editor() as editor:
+            CreateImmutableTriggers(model.__name__).database_forwards('testapp', editor, None, None)
+
+    def raw(self, sql, *params):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+
+    def test01_quiet_update_keeps_immutable_columns(self):
+        self.create_triggers(SimpleLockField)
+        obj = SimpleLockField.objects.create(special_id=1, name='Yoda', is_locked=True)
+        self.raw('UPDATE testapp_simplelockfield SET special_id = 1337, name = %s', 'Obi-Wan')
+        db_object = SimpleLockField.objects.get(pk=obj.pk)
+        self.assertEqual(1, db_object.special_id)
+        self.assertEqual('Obi-Wan', db_object.name)
+
+    def test02_quiet_update_changes_unlocked_rows(self):
+        self.create_triggers(SimpleLockField)
+        obj = SimpleLockField.objects.create(special_id=1, name='Yoda', is_locked=False)
+        self.raw('UPDATE testapp_simplelockfield SET special_id = 1337')
+        self.assertEqual(1337, SimpleLockField.objects.get(pk=obj.pk).special_id)
+
+    def test03_noisy_update_raises(self):
+        self.create_triggers(GuardedByDatabase)
+        obj = GuardedByDatabase.objects.create(special_id=1, name='Yoda', is_locked=True)
+        obj.special_id = 1337
+        self.assertEqual(1337, obj.special_id, 'expecting no python side checks')
+        with transaction.atomic():
+            self.assertRaises(IntegrityError, obj.save)
+        self.assertEqual(1, GuardedByDatabase.objects.get(pk=obj.pk).special_id)
+
+    def test04_delete(self):
+        self.create_triggers(NotDeletableLockField)
+        self.create_triggers(NoisyNotDeletable)
+        NotDeletableLockField.objects.create(special_id=1, is_locked=True)
+        NotDeletableLockField.objects.create(special_id=2, is_locked=False)
+        self.raw('DELETE FROM testapp_notdeletablelockfield')
+        self.assertEqual([1], list(NotDeletableLockField.objects.values_list('special_id', flat=True)))
+        NoisyNotDeletable.objects.create(special_id=1)
+        with transaction.atomic():
+            self.assertRaises(IntegrityError, self.raw, 'DELETE FROM testapp_noisynotdeletable')
+        self.assertEqual(1, NoisyNotDeletable.objects.count())
+
+    def test05_drop(self):
+        self.create_triggers(SimpleLockField)
+        with connection.schema_editor() as editor:
+            DropImmutableTriggers('SimpleLockField').database_forwards('testapp', editor, None, None)
+        obj = SimpleLockField.objects.create(special_id=1, name='Yoda', is_locked=True)
+        self.raw('UPDATE testapp_simplelockfield SET special_id = 1337')
+        self.assertEqual(1337, SimpleLockField.objects.get(pk=obj.pk).special_id)
+
+    def test06_command_prints_sql(self):
+        out = StringIO()
+        call_command('immutable_triggers', 'testapp.SimpleLockField', stdout=out)
+        self.assertTrue('CREATE TRIGGER "immutable_testapp_simplelockfield_update" AFTER UPDATE' in out.getvalue())
+
+    def test07_frozen_options_replay_without_the_model(self):
+        from django.db.migrations.state import ProjectState
+        from immutablemodel import operations
+        name, args, kwargs = CreateImmutableTriggers.for_model(SimpleLockField).deconstruct()
+        self.assertEqual(['SimpleLockField'], args)
+        self.assertEqual('is_locked', kwargs['options']['lock_column'])
+        state = ProjectState.from_apps(operations.apps)
+        live_apps, operations.apps = operations.apps, Apps()
+        try:
+            with connection.schema_editor() as editor:
+                CreateImmutableTriggers(*args, **kwargs).database_forwards('testapp', editor, state, state)
+            obj = SimpleLockField.objects.create(special_id=1, name='Yoda', is_locked=True)
+            self.raw('UPDATE testapp_simplelockfield SET special_id = 1337')
+            self.assertEqual(1, SimpleLockField.objects.get(pk=obj.pk).special_id)
+            # without options, dropping only needs the historical model
+            with connection.schema_editor() as editor:
+                DropImmutableTriggers('SimpleLockField').database_forwards('testapp', editor, state, state)
+        finally:
+            operations.apps = live_apps
+        self.raw('UPDATE testapp_simplelockfield SET special_id = 1337')
+        self.assertEqual(1337, SimpleLockField.objects.get(pk=obj.pk).special_id)
+
+    def test08_command_prints_operations(self):
+        out = StringIO()
+        call_command('immutable_triggers', 'testapp.SimpleLockField', migration=True, stdout=out)
+        self.assertTrue('CreateImmutableTriggers(' in out.getvalue())
+        self.assertTrue("'lock_column': 'is_locked'" in out.getvalue())
+
+    def test09_quiet_update_of_a_guarded_primary_key(self):
+        self.create_triggers(NoMeta)
+        obj = NoMeta.objects.create(name='Yoda')
+        self.raw("UPDATE testapp_nometa SET id = 99, name = 'Anakin'")
+        self.assertEqual([(obj.pk, 'Yoda')], list(NoMeta.objects.values_list('pk', 'name')))
+
+class Case15_DirtyFieldsTest(TestCase):
+    def setUp(self):
+        self.obj = SimpleLockField.objects.create(special_id=1, name='Yoda', is_locked=True)
+
+    def test01_no_op_save_of_locked_instance_issues_no_query(self):
+        obj = SimpleLockField.objects.get(pk=self.obj.pk)
+        obj.special_id = 1337
+        with self.assertNumQueries(0):
+            obj.save()
+
+    def test02_saves_only_changed_fields(self):
+        obj = SimpleLockField.objects.get(pk=self.obj.pk)
+        obj.name = 'Obi-Wan'
+        with CaptureQueriesContext(connection) as queries:
+            obj.save()
+        self.assertEqual(1, len(queries))
+        self.assertTrue('"name"' in queries[0]['sql'])
+        self.assertFalse('"special_id"' in queries[0]['sql'])
+        self.assertEqual('Obi-Wan', SimpleLockField.objects.get(pk=obj.pk).name)
+        with self.assertNumQueries(0):
+            obj.save()
+
+    def test03_unchanged_immutable_fields_are_not_saved(self):
+        # as a ModelForm assigns every field
+        obj = SimpleLockField.objects.get(pk=self.obj.pk)
+        obj.special_id = 1
+        obj.name = 'Obi-Wan'
+        with CaptureQueriesContext(connection) as queries:
+            obj.save()
+        self.assertEqual(1, len(queries))
+        self.assertFalse('"special_id"' in queries[0]['sql'])
+
+    def test04_saves_changes_made_before_locking(self):
+        obj = SimpleLockField.objects.create(special_id=1, name='Yoda', is_locked=False)
+        obj.special_id = 1337
+        obj.is_locked = True
+        obj.save()
+        db_object = SimpleLockField.objects.get(pk=obj.pk)
+        self.assertEqual(1337, db_object.special_id)
+        self.assertTrue(db_object.is_locked)
+
+    def test05_refresh_from_db_is_not_a_change(self):
+        obj = SimpleLockField.objects.get(pk=self.obj.pk)
+        obj.name = 'Obi-Wan'
+        obj.refresh_from_db()
+        with self.assertNumQueries(0):
+            obj.save()
+        self.assertEqual('Yoda', obj.name)
+
+class Case16_RefreshFromDbTest(TestCase):
+    def test01_refreshes_only_mutable_fields_of_locked_instances(self):
+        obj = SimpleLockField.objects.create(special_id=1, name='Yoda', is_locked=True)
+        SimpleLockField.objects.filter(pk=obj.pk).update(name='Obi-Wan')
+        with CaptureQueriesContext(connection) as queries:
+            obj.refresh_from_db()
+        self.assertEqual(1, len(queries))
+        self.assertFalse('"special_id"' in queries[0]['sql'])
+        self.assertEqual('Obi-Wan', obj.name)
+        self.assertEqual(1, obj.special_id)
+
+    def test02_no_query_without_mutable_fields(self):
+        obj = NoMeta.objects.create(name='Vader')
+        with self.assertNumQueries(0):
+            obj.refresh_from_db()
+
+    def test03_refreshes_everything_while_unlocked(self):
+        obj = SimpleLockField.objects.create(special_id=1, name='Yoda', is_locked=False)
+        SimpleLockField.objects.filter(pk=obj.pk).update(special_id=1337)
+        obj.refresh_from_db()
+        self.assertEqual(1337, obj.special_id)
+
+
+    def test04_refreshes_everything_when_locked_but_not_saved(self):
+        obj = SimpleLockField.objects.create(special_id=1, name='Yoda', is_locked=False)
+        obj.special_id = 1337
+        obj.is_locked = True
+        obj.refresh_from_db()
+        self.assertEqual((1, False), (obj.special_id, obj.is_locked))
+        obj.is_locked = True
+        SimpleLockField.objects.filter(pk=obj.pk).update(special_id=1337)
+        obj.refresh_from_db()
+        self.assertEqual((1337, False), (obj.special_id, obj.is_locked))
+
+
+class Case17_BulkLockTest(TestCase):
+    def setUp(self):
+        self.first = SimpleLockField.objects.create(special_id=1, name='Yoda', is_locked=False)
+        self.second = SimpleLockField.objects.create(special_id=2, name='Yoda', is_locked=False)
+        self.locked = SimpleLockField.objects.create(special_id=3, name='Yoda', is_locked=True)
+
+    def test01_locks_unlocked_rows_in_one_query(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(2, SimpleLockField.objects.lock())
+        self.assertEqual(3, SimpleLockField.objects.filter(is_locked=True).count())
+
+    def test02_locks_given_queryset_only(self):
+        self.assertEqual(1, SimpleLockField.objects.filter(pk=self.first.pk).lock())
+        self.assertEqual(0, SimpleLockField.objects.lock(SimpleLockField.objects.filter(pk=self.first.pk)))
+        self.assertEqual([self.second.pk], list(SimpleLockField.objects.unlocked().values_list('pk', flat=True)))
+
+    def test03_sends_signals_once_per_batch(self):
+        sent = []
+        def receiver(signal, sender, **kwargs):
+            sent.append((signal, sender, sorted(kwargs['pks']), kwargs.get('count')))
+        pre_lock.connect(receiver, sender=SimpleLockField)
+        post_lock.connect(receiver, sender=SimpleLockField)
+        try:
+            self.assertEqual(2, SimpleLockField.objects.lock())
+            self.assertEqual(0, SimpleLockField.objects.lock())
+        finally:
+            pre_lock.disconnect(receiver, sender=SimpleLockField)
+            post_lock.disconnect(receiver, sender=SimpleLockField)
+        pks = sorted([self.first.pk, self.second.pk])
+        self.assertEqual([
+            (pre_lock, SimpleLockField, pks, None),
+            (post_lock, SimpleLockField, pks, 2),
+        ], sent)
+
+    def test04_works_on_plain_querysets(self):
+        NotDeletableLockField.objects.create(special_id=1)
+        self.assertEqual(1, NotDeletableLockField.objects.lock(models.QuerySet(NotDeletableLockField)))
+
+    def test05_needs_a_boolean_lock_field(self):
+        self.assertRaises(TypeError, SimpleNoLockField.objects.lock)
+        self.assertRaises(TypeError, NoMeta.objects.lock)
+
+
+class Case18_InstanceCacheTest(TransactionTestCase):
+    def setUp(self):
+        instance_cache.clear()
+        self.locked = CachedLockField.objects.create(special_id=1, name='Yoda', is_locked=True)
+        self.unlocked = CachedLockField.objects.create(special_id=2, name='Yoda', is_locked=False)
+        list(CachedLockField.objects.all())
+
+    def tearDown(self):
+        instance_cache.clear()
+
+    def test01_serves_locked_instances_without_a_query(self):
+        with self.assertNumQueries(0):
+            obj = CachedLockField.objects.get(pk=self.locked.pk)
+            other = CachedLockField.objects.get(id=str(self.locked.pk))
+        self.assertEqual((1, 'Yoda', True), (obj.special_id, obj.name, obj.is_locked))
+        self.assertIsNot(obj, other)
+        self.assertFalse(obj._state.adding)
+        self.assertEqual('default', obj._state.db)
+        self.assertEqual(2, instance_cache.stats()['hits'])
+
+    def test02_unlocked_and_filtered_lookups_use_the_database(self):
+        with self.assertNumQueries(3):
+            CachedLockField.objects.get(pk=self.unlocked.pk)
+            CachedLockField.objects.filter(special_id=1).get(pk=self.locked.pk)
+            CachedLockField.objects.only('name').get(pk=self.locked.pk)
+        self.assertEqual(1, instance_cache.stats()['misses'])
+
+    def test03_invalidated_by_saves(self):
+        obj = CachedLockField.objects.get(pk=self.locked.pk)
+        obj.name = 'Obi-Wan'
+        obj.save()
+        with self.assertNumQueries(1):
+            self.assertEqual('Obi-Wan', CachedLockField.objects.get(pk=self.locked.pk).name)
+
+    def test04_invalidated_by_queryset_updates(self):
+        CachedLockField.objects.update(name='Obi-Wan')
+        with self.assertNumQueries(1):
+            self.assertEqual('Obi-Wan', CachedLockField.objects.get(pk=self.locked.pk).name)
+
+    def test05_invalidated_by_deletes(self):
+        CachedLockField.objects.get(pk=self.locked.pk).delete()
+        self.assertRaises(CachedLockField.DoesNotExist, CachedLockField.objects.get, pk=self.locked.pk)
+        CachedLockField.objects.create(special_id=3, is_locked=True).delete()
+        self.assertEqual(0, instance_cache.stats()['size'])
+
+    def test06_evicts_least_recently_used(self):
+        with self.settings(IMMUTABLE_CACHE_SIZE=2):
+            instance_cache.clear()
+            first = CachedLockField.objects.create(special_id=3, is_locked=True)
+            second = CachedLockField.objects.create(special_id=4, is_locked=True)
+            list(CachedLockField.objects.order_by('pk'))
+            # self.locked went first, and takes the place of first when loaded again
+            CachedLockField.objects.get(pk=self.locked.pk)
+            CachedLockField.objects.get(pk=second.pk)
+            self.assertEqual({'hits': 1, 'misses': 1, 'evictions': 2, 'size': 2}, instance_cache.stats())
+            with self.assertNumQueries(1):
+                CachedLockField.objects.get(pk=first.pk)
+
+    def test07_off_by_default(self):
+        obj = SimpleLockField.objects.create(special_id=1, name='Yoda', is_locked=True)
+        list(SimpleLockField.objects.all())
+        with self.assertNumQueries(1):
+            SimpleLockField.objects.get(pk=obj.pk)
+
+    def test08_not_cached_in_a_transaction(self):
+        instance_cache.clear()
+        try:
+            with transaction.atomic():
+                obj = CachedLockField.objects.create(special_id=3, name='Yoda', is_locked=True)
+                list(CachedLockField.objects.all())
+                raise IntegrityError
+        except IntegrityError:
+            pass
+        self.assertRaises(CachedLockField.DoesNotExist, CachedLockField.objects.get, pk=obj.pk)
+
+    def test09_noisy_rows_deleted_by_querysets_and_cascades(self):
+        reference = Reference.objects.create(name='Jedi')
+        pks = [NoisyCached.objects.create(special_id=1).pk,
+               NoisyCached.objects.create(special_id=2, reference=reference).pk]
+        list(NoisyCached.objects.all())
+        NoisyCached.objects.filter(special_id=1).delete()
+        reference.delete()
+        for pk in pks:
+            self.assertRaises(NoisyCached.DoesNotExist, NoisyCached.objects.get, pk=pk)
+
+    def test10_own_from_db_kept(self):
+        obj = LoadCountingCached.objects.create(special_id=1)
+        LoadCountingCached.loaded = 0
+        list(LoadCountingCached.objects.all())
+        with self.assertNumQueries(0):
+            LoadCountingCached.objects.get(pk=obj.pk)
+        # (instances from the cache are built by from_db too)
+        self.assertEqual(2, LoadCountingCached.loaded)
+
+
+class Case19_SharedInstanceCacheTest(TransactionTestCase):
+    backend = 'django.core.cache.backends.locmem.LocMemCache'
+
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        self.settings_override = self.settings(
+            CACHES={
+                'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+                'shared': {'BACKEND': self.backend, 'LOCATION': self.location},
+            },
+            IMMUTABLE_CACHE_ALIAS='shared',
+        )
+        self.settings_override.enable()
+        caches['shared'].clear()
+        self.locked = [CachedLockField.objects.create(special_id=i, name='Yoda', is_locked=True) for i in range(3)]
+        self.unlocked = CachedLockField.objects.create(special_id=3, name='Yoda', is_locked=False)
+        self.pks = [obj.pk for obj in self.locked]
+        instance_cache.clear()
+
+    def tearDown(self):
+        instance_cache.clear()
+        caches['shared'].clear()
+        self.settings_override.disable()
+        shutil.rmtree(self.location)
+
+    def other_process(self):
+        instance_cache.clear()
+
+    def test01_get_is_shared_between_processes(self):
+        with self.assertNumQueries(1):
+            CachedLockField.objects.get(pk=self.pks[0])
+        self.other_process()
+        with self.assertNumQueries(0):
+            obj = CachedLockField.objects.get(pk=self.pks[0])
+        self.assertEqual((0, 'Yoda', True), (obj.special_id, obj.name, obj.is_locked))
+
+    def test02_get_many_only_selects_what_isnt_cached(self):
+        with self.assertNumQueries(1):
+            found = CachedLockField.objects.get_many(self.pks[:2])
+        self.assertEqual(set(self.pks[:2]), set(found))
+        self.other_process()
+        with self.assertNumQueries(1):
+            found = CachedLockField.objects.get_many(self.pks + [self.unlocked.pk])
+        self.assertEqual(set(self.pks + [self.unlocked.pk]), set(found))
+        self.assertEqual(2, found[self.locked[2].pk].special_id)
+        with self.assertNumQueries(1):
+            # the unlocked one isn't cached
+            CachedLockField.objects.get_many(self.pks + [self.unlocked.pk])
+
+    def test03_saves_and_updates_invalidate(self):
+        CachedLockField.objects.get_many(self.pks)
+        obj = CachedLockField.objects.get(pk=self.pks[0])
+        obj.name = 'Obi-Wan'
+        obj.save()
+        self.other_process()
+        with self.assertNumQueries(1):
+            self.assertEqual('Obi-Wan', CachedLockField.objects.get(pk=self.pks[0]).name)
+        CachedLockField.objects.filter(pk=self.pks[1]).update(name='Obi-Wan')
+        self.other_process()
+        with self.assertNumQueries(1):
+            found = CachedLockField.objects.get_many(self.pks)
+        self.assertEqual('Obi-Wan', found[self.pks[1]].name)
+
+    def test04_can_refetch_mutable_fields(self):
+        CachedLockField.objects.get_many(self.pks)
+        # changed without going through the model
+        with connection.cursor() as cursor:
+            cursor.execute('UPDATE testapp_cachedlockfield SET name = %s', ['Obi-Wan'])
+        self.other_process()
+        with self.settings(IMMUTABLE_CACHE_REFETCH_MUTABLE=True):
+            with self.assertNumQueries(1):
+                found = CachedLockField.objects.get_many(self.pks)
+        self.assertEqual(set(['Obi-Wan']), set(obj.name for obj in found.values()))
+        self.assertEqual(set([0, 1, 2]), set(obj.special_id for obj in found.values()))
+
+    def test05_deletes_invalidate(self):
+        CachedLockField.objects.get_many(self.pks)
+        CachedLockField.objects.get(pk=self.pks[0]).delete()
+        self.other_process()
+        self.assertEqual(set(self.pks[1:]), set(CachedLockField.objects.get_many(self.pks)))
+
+    def test06_not_shared_from_a_transaction(self):
+        try:
+            with transaction.atomic():
+                obj = CachedLockField.objects.create(special_id=4, name='Yoda', is_locked=True)
+                CachedLockField.objects.get(pk=obj.pk)
+                raise IntegrityError
+        except IntegrityError:
+            pass
+        self.other_process()
+        self.assertEqual({}, CachedLockField.objects.get_many([obj.pk]))
+
+    def test07_one_round_trip_per_lookup(self):
+        CachedLockField.objects.get_many(self.pks)
+        self.other_process()
+        cache, calls, depth = caches['shared'], [], []
+
+        def counting(name, original):
+            # (only the calls made to the cache, not those it makes to itself)
+            def call(*args, **kwargs):
+                if not depth:
+                    calls.append(name)
+                depth.append(name)
+                try:
+                    return original(*args, **kwargs)
+                finally:
+                    depth.pop()
+            return call
+        for name in ('get', 'get_many', 'add'):
+            setattr(cache, name, counting(name, getattr(cache, name)))
+        try:
+            CachedLockField.objects.get_many(self.pks)
+            CachedLockField.objects.get_many([1337 + self.pks[-1]])
+        finally:
+            for name in ('get', 'get_many', 'add'):
+                delattr(cache, name)
+        self.assertEqual(['get_many', 'get_many'], calls)
+
+
+class Case20_FileBasedSharedInstanceCacheTest(Case19_SharedInstanceCacheTest):
+    backend = 'django.core.cache.backends.filebased.FileBasedCache'
+
+
+class Case21_FrozenTest(TestCase):
+    def setUp(self):
+        self.reference = Reference.objects.create(name='Jedi')
+        self.obj = HavingForeignKey.objects.create(reference=self.reference, special_id=1, name='Yoda')
+
+    def test01_rows_as_tuples_of_field_values(self):
+        with self.assertNumQueries(1):
+            rows = list(HavingForeignKey.objects.frozen())
+        self.assertEqual([(self.obj.pk, self.reference.pk, 1, 'Yoda')], [tuple(row) for row in rows])
+        row = rows[0]
+        self.assertEqual((self.obj.pk, self.obj.pk, self.reference.pk, 1, 'Yoda'),
+                         (row.pk, row.id, row.reference_id, row.special_id, row.name))
+        self.assertRaises(AttributeError, setattr, row, 'name', 'Obi-Wan')
+        self.assertRaises(AttributeError, setattr, row, 'other', 1)
+
+    def test02_hashable_and_comparable(self):
+        row = next(HavingForeignKey.objects.frozen())
+        self.assertEqual(row, next(HavingForeignKey.objects.all().frozen()))
+        self.assertEqual(1, len(set([row, next(HavingForeignKey.objects.frozen())])))
+        self.assertNotEqual(row, tuple(row))
+        NoMeta.objects.create(name='Yoda')
+        self.assertNotEqual(row, next(NoMeta.objects.frozen()))
+
+    def test03_to_instance(self):
+        row = next(HavingForeignKey.objects.frozen())
+        with self.assertNumQueries(0):
+            obj = row.to_instance()
+        self.assertEqual(self.obj, obj)
+        self.assertEqual('default', obj._state.db)
+        self.assertFalse(obj._state.adding)
+        obj.special_id = 1337
+        self.assertEqual(1, obj.special_id)
+
+    def test04_pickles(self):
+        row = next(HavingForeignKey.objects.frozen())
+        self.assertEqual(row, pickle.loads(pickle.dumps(row, pickle.HIGHEST_PROTOCOL)))
+
+
+class Case22_PickleTest(TestCase):
+    def setUp(self):
+        self.obj = SimpleLockField.objects.create(special_id=1, name='Yoda', is_locked=True)
+
+    def round_trip(self, obj):
+        return pickle.loads(pickle.dumps(obj, pickle.HIGHEST_PROTOCOL))
+
+    def test01_restores_field_values_and_state(self):
+        obj = self.round_trip(SimpleLockField.objects.get(pk=self.obj.pk))
+        self.assertEqual((self.obj.pk, 1, 'Yoda', True), (obj.pk, obj.special_id, obj.name, obj.is_locked))
+        self.assertEqual('default', obj._state.db)
+        self.assertFalse(obj._state.adding)
+        obj.special_id = 1337
+        self.assertEqual(1, obj.special_id)
+        self.assertTrue(self.round_trip(SimpleLockField(special_id=2))._state.adding)
+
+    def test02_smaller_than_the_whole_dict(self):
+        obj = SimpleLockField.objects.get(pk=self.obj.pk)
+        compact = pickle.dumps(obj, pickle.HIGHEST_PROTOCOL)
+        usual = pickle.dumps(PlainLockField.objects.create(special_id=1, name='Yoda', is_locked=True),
+                             pickle.HIGHEST_PROTOCOL)
+        self.assertLess(len(compact), len(usual))
+
+    def test03_keeps_other_attributes(self):
+        reference = Reference.objects.create(name='Jedi')
+        obj = HavingForeignKey.objects.create(reference=reference, special_id=1, name='Yoda')
+        obj = self.round_trip(HavingForeignKey.objects.select_related('reference').get(pk=obj.pk))
+        with self.assertNumQueries(0):
+            self.assertEqual('Jedi', obj.reference.name)
+
+    def test04_reads_the_usual_pickles(self):
+        obj = SimpleLockField.objects.get(pk=self.obj.pk)
+        # what django itself pickles as the state: the __dict__
+        restored = SimpleLockField.__new__(SimpleLockField)
+        restored.__setstate__(pickle.loads(pickle.dumps(models.Model.__reduce__(obj)[2])))
+        self.assertEqual((1, 'Yoda'), (restored.special_id, restored.name))
+
+    def test05_refuses_pickles_of_other_fields(self):
+        obj = SimpleLockField.objects.get(pk=self.obj.pk)
+        layout, values, db, adding, extra = obj.__reduce__()[2]
+        restored = SimpleLockField.__new__(SimpleLockField)
+        # eg. name and special_id swapped, or renamed
+        self.assertRaises(ValueError, restored.__setstate__, ('0123abcd', values, db, adding, extra))
+        self.assertRaises(ValueError, restored.__setstate__, (layout, values[1:], db, adding, extra))
+
+    def test06_deferred_instances(self):
+        obj = self.round_trip(SimpleLockField.objects.only('name').get(pk=self.obj.pk))
+        self.assertEqual('Yoda', obj.name)
+        self.assertEqual(1, obj.special_id)
+
+
+class Case23_InstrumentationTest(TestCase):
+    def setUp(self):
+        self.obj = NotDeletableLockField.objects.create(special_id=1, is_locked=True)
+
+    def tearDown(self):
+        instrumentation.disable()
+        instrumentation.reset()
+
+    def test01_signals_for_blocked_writes_and_deletes(self):
+        sent = []
+        def receiver(signal, sender, instance, **kwargs):
+            sent.append((signal, sender, instance.pk, kwargs.get('name'), kwargs.get('value')))
+        immutable_write_blocked.connect(receiver)
+        immutable_delete_blocked.connect(receiver)
+        try:
+            obj = NotDeletableLockField.objects.get(pk=self.obj.pk)
+            obj.special_id = 1
+            obj.special_id = 1337
+            obj.delete()
+            self.assertRaises(ValueError, setattr, NoisyLockField.objects.create(special_id=1, is_locked=True),
+                              'special_id', 2)
+        finally:
+            immutable_write_blocked.disconnect(receiver)
+            immutable_delete_blocked.disconnect(receiver)
+        self.assertEqual([
+            (immutable_write_blocked, NotDeletableLockField, self.obj.pk, 'special_id', 1337),
+            (immutable_delete_blocked, NotDeletableLockField, self.obj.pk, None, None),
+            (immutable_write_blocked, NoisyLockField, sent[2][2], 'special_id', 2),
+        ], sent)
+
+    def test02_counters(self):
+        instrumentation.enable()
+        obj = NotDeletableLockField.objects.only('special_id').get(pk=self.obj.pk)
+        obj.special_id = 1337
+        obj.special_id = 1338
+        obj.delete()
+        self.assertEqual({
+            'guard_calls': 2,
+            'blocked_writes': 2,
+            'blocked_deletes': 1,
+            # loading the deferred lock field
+            'guard_queries': 1,
+        }, instrumentation.counters(NotDeletableLockField))
+        self.assertEqual([NotDeletableLockField], list(instrumentation.counters()))
+        instrumentation.reset()
+        self.assertEqual(0, instrumentation.counters(NotDeletableLockField)['guard_calls'])
+
+    def test03_nothing_counted_when_disabled(self):
+        instrumentation.enable()
+        instrumentation.disable()
+        self.assertFalse(instrumentation.is_enabled())
+        self.obj.special_id = 1337
+        self.obj.delete()
+        self.assertEqual({}, instrumentation.counters())
+
+    def test04_interleaved_with_profiling(self):
+        can_change_field = ImmutableModel.__dict__['can_change_field']
+        instrumentation.enable()
+        profile = GuardProfile().start()
+        instrumentation.disable()
+        self.obj.special_id = 1337
+        profile.stop()
+        self.assertEqual({}, instrumentation.counters())
+        self.assertEqual(1, profile.models[NotDeletableLockField]['can_change_field']['calls'])
+        self.assertIs(can_change_field, ImmutableModel.__dict__['can_change_field'])
+
+
+class Case24_GuardProfileTest(TestCase):
+    def setUp(self):
+        self.obj = SimpleLockField.objects.create(special_id=1, name='Yoda', is_locked=True)
+
+    def test01_counts_calls_and_queries_per_model(self):
+        obj = SimpleLockField.objects.only('special_id').get(pk=self.obj.pk)
+        with GuardProfile() as profile:
+            obj.special_id = 1337
+            obj.name = 'Obi-Wan'
+            obj.is_immutable()
+        counts = profile.models[SimpleLockField]
+        self.assertEqual(2, counts['can_change_field']['calls'])
+        self.assertEqual(2, counts['is_immutable']['calls'])
+        self.assertTrue(counts['can_change_field']['seconds'] > 0)
+        # loading the deferred lock field, once
+        self.assertEqual(1, len(counts['queries']))
+        self.assertIn('"is_locked"', counts['queries'][0])
+        self.assertEqual(['testapp.SimpleLockField'], list(profile.report()))
+
+    def test02_nothing_recorded_outside(self):
+        can_change_field = ImmutableModel.__dict__['can_change_field']
+        with GuardProfile() as profile:
+            self.assertIsNot(can_change_field, ImmutableModel.__dict__['can_change_field'])
+        self.obj.special_id = 1337
+        self.assertEqual({}, profile.models)
+        self.assertIs(can_change_field, ImmutableModel.__dict__['can_change_field'])
+
+    def test03_queries_reported_once_the_log_is_full(self):
+        obj = SimpleLockField.objects.only('special_id').get(pk=self.obj.pk)
+        log = connection.queries_log
+        log.extend({'sql': 'SELECT 1', 'time': '0.000'} for i in range(log.maxlen))
+        try:
+            with GuardProfile() as profile:
+                obj.special_id = 1337
+        finally:
+            log.clear()
+        self.assertEqual(1, len(profile.models[SimpleLockField]['queries']))
+
+
+class Case25_SystemChecksTest(TestCase):
+    def define(self, **options):
+        attrs = dict(options, app_label='testapp', apps=Apps())
+        return type(str('Checked'), (ImmutableModel,), {
+            '__module__': __name__,
+            'Meta': type(str('Meta'), (object,), attrs),
+            'special_id': models.IntegerField(),
+            'is_locked': models.BooleanField(default=False),
+        })
+
+    def check_ids(self, **options):
+        return [error.id for error in self.define(**options).check()]
+
+    def test01_valid_options(self):
+        self.assertEqual([], self.check_ids())
+        self.assertEqual([], self.check_ids(immutable_fields=['special_id'], immutable_lock_field='is_locked'))
+        self.assertEqual([], self.check_ids(immutable_lock_field=None, immutable_quiet=False))
+
+    def test02_invalid_options_are_reported_rather_than_raised(self):
+        # too easily mistaken for a list of names to wait for the checks
+        self.assertRaises(TypeError, self.define, immutable_fields='special_id')
+        self.assertRaises(TypeError, self.define, mutable_fields='is_locked')
+        self.assertEqual([], self.check_ids(mutable_fields=('is_locked',)))
+        self.assertEqual(['immutablemodel.E002'],
+                         self.check_ids(immutable_fields=['special_id'], mutable_fields=['is_locked']))
+        self.assertEqual(['immutablemodel.E003'], self.check_ids(immutable_lock_field=1))
+        self.assertEqual(['immutablemodel.E004'], self.check_ids(immutable_lock_field='is_sealed'))
+        self.assertEqual(['immutablemodel.E005', 'immutablemodel.E005'],
+                         self.check_ids(immutable_quiet='yes', immutable_cache_instances=1))
+        self.assertEqual(['immutablemodel.E006'], self.check_ids(immutable_fingerprint_field='is_locked'))
+        self.assertEqual(['immutablemodel.E006'], self.check_ids(immutable_fingerprint_field='fingerprint'))
+
+    def test03_unknown_field_names(self):
+        self.assertEqual(['immutablemodel.W001'], self.check_ids(immutable_fields=['special_idd']))
+
+    def test04_test_models_pass(self):
+        call_command('check', stdout=StringIO())
+
+
+@skipUnless(six.PY3, 'asyncio is Python 3 only')
+class Case26_AsyncTest(TransactionTestCase):
+    def setUp(self):
+        import asyncio
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        self.loop.close()
+
+    def run_async(self, awaitable):
+        return self.loop.run_until_complete(awaitable)
+
+    def test01_asave_saves_only_the_fields_written(self):
+        obj = SimpleLockField.objects.create(special_id=1, name='Yoda', is_locked=True)
+        obj = SimpleLockField.objects.get(pk=obj.pk)
+        SimpleLockField.objects.filter(pk=obj.pk).update(name='Obi-Wan')
+        obj.special_id = 1337
+        self.run_async(obj.asave())
+        self.assertEqual((1, 'Obi-Wan'), SimpleLockField.objects.values_list('special_id', 'name').get())
+
+    def test02_adelete_keeps_the_rules(self):
+        obj = NotDeletableLockField.objects.create(special_id=1, is_locked=True)
+        self.run_async(obj.adelete())
+        self.assertTrue(NotDeletableLockField.objects.exists())
+        noisy = NoisyNotDeletable.objects.create(special_id=1)
+        self.assertRaises(CantDeleteImmutableException, self.run_async, noisy.adelete())
+        unlocked = NotDeletableLockField.objects.create(special_id=2)
+        self.run_async(unlocked.adelete())
+        self.assertEqual(None, unlocked.pk)
+        self.assertEqual(1, NotDeletableLockField.objects.count())
+
+    def test03_bulk_operations(self):
+        SimpleLockField.objects.create(special_id=1, name='Yoda', is_locked=True)
+        SimpleLockField.objects.create(special_id=2, name='Yoda', is_locked=False)
+        self.assertEqual(1, self.run_async(SimpleLockField.objects.aupdate(special_id=1337)))
+        self.assertEqual(1, self.run_async(SimpleLockField.objects.alock()))
+        self.assertEqual(0, self.run_async(SimpleLockField.objects.all().alock()))
+        self.assertEqual([1, 1337], sorted(SimpleLockField.objects.values_list('special_id', flat=True)))
+        NotDeletableLockField.objects.create(special_id=1, is_locked=True)
+        self.assertEqual(1, self.run_async(NotDeletableLockField.objects.all().adelete()))
+
+    def test04_connections_are_recycled(self):
+        from unittest import mock
+        obj = SimpleLockField.objects.create(special_id=1, name='Yoda', is_locked=True)
+        with mock.patch('django.db.close_old_connections') as close_old_connections:
+            self.run_async(obj.asave())
+        # before and after, as for a request
+        self.assertEqual(2, close_old_connections.call_count)
+
+    def test05_awaited_on_the_running_loop(self):
+        import asyncio
+        first = SimpleLockField.objects.create(special_id=1, name='Yoda', is_locked=False)
+        second = SimpleLockField.objects.create(special_id=2, name='Yoda', is_locked=False)
+        first.special_id, second.special_id = 11, 12
+        # nothing is done until it's awaited
+        saving = first.asave()
+        self.assertEqual(1, SimpleLockField.objects.get(pk=first.pk).special_id)
+        self.run_async(asyncio.gather(saving, second.asave()))
+        self.assertEqual([11, 12], sorted(SimpleLockField.objects.values_list('special_id', flat=True)))
+
+    def test06_number_of_threads(self):
+        from immutablemodel import asynchronous
+        executor = asynchronous.get_executor()
+        self.assertEqual(asynchronous.DEFAULT_WORKERS, executor._max_workers)
+        try:
+            asynchronous._executor = None
+            with self.settings(IMMUTABLE_ASYNC_WORKERS=4):
+                self.assertEqual(4, asynchronous.get_executor()._max_workers)
+            asynchronous.get_executor().shutdown()
+        finally:
+            asynchronous._executor = executor
+
+
+class Case27_ConditionalUpdateTest(TransactionTestCase):
+    def load_then_lock(self, model, **kwargs):
+        """an unlocked instance, whose row is locked once it's loaded"""
+        obj = model.objects.create(special_id=1, **kwargs)
+        obj = model.objects.get(pk=obj.pk)
+        model.objects.filter(pk=obj.pk).update(is_locked=True)
+        return obj
+
+    def test01_row_locked_since_loading_keeps_its_values(self):
+        obj = self.load_then_lock(SimpleLockField, name='Yoda')
+        obj.special_id = 1337
+        obj.name = 'Obi-Wan'
+        obj.save()
+        self.assertEqual((1, 'Obi-Wan', True), SimpleLockField.objects.values_list('special_id', 'name', 'is_locked').get())
+
+    def test02_noisy_row_locked_since_loading(self):
+        obj = self.load_then_lock(NoisyLockField)
+        obj.special_id = 1337
+        self.assertRaises(ValueError, obj.save)
+        self.assertEqual(1, NoisyLockField.objects.get().special_id)
+        # saving unchanged values is fine
+        obj.special_id = 1
+        obj.save()
+
+    def test03_unlocked_rows_and_new_rows_are_saved(self):
+        obj = SimpleLockField.objects.create(special_id=1, name='Yoda')
+        obj.special_id = 1337
+        obj.save()
+        self.assertEqual(1337, SimpleLockField.objects.get().special_id)
+        # a row that has gone is inserted again, as by a plain Model
+        SimpleLockField.objects.all().delete()
+        obj.save()
+        self.assertEqual(1337, SimpleLockField.objects.get(pk=obj.pk).special_id)
+
+    def test04_one_query_when_unlocked(self):
+        obj = SimpleLockField.objects.create(special_id=1, name='Yoda')
+        obj.special_id = 1337
+        with CaptureQueriesContext(connection) as queries:
+            obj.save()
+        sql = ' '.join(query['sql'] for query in queries.captured_queries)
+        self.assertEqual((1, 0), (sql.count('UPDATE'), sql.count('SELECT')))
+
+    def test05_lock_field_on_a_parent_table(self):
+        obj = LockedChild.objects.create(special_id=1, code=1)
+        obj.code = 2
+        obj.is_locked = True
+        obj.save()
+        self.assertEqual((1, 2, True), LockedChild.objects.values_list('special_id', 'code', 'is_locked').get())
+        # the child table follows the parent's: locked since loading
+        obj = LockedChild.objects.create(special_id=1, code=1)
+        obj = LockedChild.objects.get(pk=obj.pk)
+        LockedParent.objects.filter(pk=obj.pk).update(is_locked=True)
+        obj.code = 2
+        obj.special_id = 2
+        obj.save()
+        self.assertEqual((1, 1, True), LockedChild.objects.values_list('special_id', 'code', 'is_locked').get(pk=obj.pk))
+
+    @skipUnless(getattr(connection.features, 'can_share_in_memory_db', True),
+                "the threads can't share the test database")
+    def test06_lock_race_between_threads(self):
+        import threading
+        obj = SimpleLockField.objects.create(special_id=1, name='Yoda')
+        loaded, locked = threading.Event(), threading.Event()
+        errors = []
+
+        def change():
+            try:
+                stale = SimpleLockField.objects.get(pk=obj.pk)
+                loaded.set()
+                locked.wait(5)
+                stale.special_id = 1337
+                stale.save()
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        def lock():
+            try:
+                loaded.wait(5)
+                SimpleLockField.objects.filter(pk=obj.pk).lock()
+            except Exception as e:
+                errors.append(e)
+            finally:
+                locked.set()
+                connection.close()
+
+        threads = [threading.Thread(target=change), threading.Thread(target=lock)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([], errors)
+        self.assertEqual((1, True), SimpleLockField.objects.values_list('special_id', 'is_locked').get())
+
+    def test07_filling_in_an_empty_field_of_a_locked_row(self):
+        for model in (FingerprintedLockField, NoisyFingerprinted):
+            model.objects.create(special_id=1, label='', is_locked=True)
+            obj = model.objects.get()
+            obj.label = 'Master'
+            obj.save()
+            self.assertEqual('Master', model.objects.get().label)
+            self.assertEqual(obj.immutable_fingerprint, model.objects.get().fingerprint)
+
+
+class Case28_FingerprintTest(TestCase):
+    def create(self, model=FingerprintedLockField, **kwargs):
+        return model.objects.create(special_id=kwargs.pop('special_id', 1), name='Yoda', **kwargs)
+
+    def test01_none_until_locked(self):
+        obj = self.create()
+        self.assertEqual(None, obj.immutable_fingerprint)
+        self.assertEqual('', FingerprintedLockField.objects.get().fingerprint)
+
+    def test02_stored_when_locked(self):
+        obj = self.create()
+        obj.is_locked = True
+        obj.save()
+        self.assertEqual(40, len(obj.immutable_fingerprint))
+        loaded = FingerprintedLockField.objects.get()
+        self.assertEqual(obj.immutable_fingerprint, loaded.fingerprint)
+        with self.assertNumQueries(0):
+            self.assertEqual(obj.immutable_fingerprint, loaded.immutable_fingerprint)
+
+    def test03_same_content_same_fingerprint(self):
+        a, b = self.create(is_locked=True), self.create(is_locked=True, label='Master')
+        c = self.create(is_locked=True)
+        c.name = 'Obi-Wan'  # mutable: not part of it
+        self.assertEqual(a.immutable_fingerprint, c.immutable_fingerprint)
+        self.assertNotEqual(a.immutable_fingerprint, b.immutable_fingerprint)
+        self.assertEqual(2, len(set(obj.immutable_fingerprint for obj in FingerprintedLockField.objects.all())))
+        # nor are None and '' alike
+        self.assertNotEqual(b.immutable_fingerprint, self.create(is_locked=True, label='').immutable_fingerprint)
+        # nor rows of different models
+        other = self.create(SimpleLockField, is_locked=True)
+        self.assertNotEqual(other.immutable_fingerprint, self.create(ComplexLockField, is_locked=True).immutable_fingerprint)
+
+    def test04_changes_before_locking_are_fingerprinted(self):
+        obj = self.create()
+        obj.is_locked = True
+        before = obj.immutable_fingerprint
+        obj.is_locked = False
+        obj.special_id = 1337
+        obj.is_locked = True
+        self.assertNotEqual(before, obj.immutable_fingerprint)
+        obj.save()
+        self.assertEqual(obj.immutable_fingerprint, FingerprintedLockField.objects.get().fingerprint)
+
+    def test05_bulk_lock_stores_fingerprints(self):
+        for special_id in range(5):
+            self.create(special_id=special_id)
+        self.create(special_id=1, is_locked=True)
+        self.assertEqual(5, FingerprintedLockField.objects.lock())
+        rows = list(FingerprintedLockField.objects.all())
+        self.assertEqual(6, len(rows))
+        for obj in rows:
+            self.assertEqual(obj.fingerprint, fingerprint(FingerprintedLockField, [obj.special_id, obj.label]))
+        self.assertEqual(5, len(set(obj.fingerprint for obj in rows)))
+
+    def test06_filled_in_for_rows_locked_some_other_way(self):
+        for model in (FingerprintedLockField, NoisyFingerprinted):
+            model.objects.create(special_id=1, name='Yoda')
+            model.objects.update(is_locked=True)
+            obj = model.objects.get()
+            obj.name = 'Obi-Wan'
+            with self.assertNumQueries(1):
+                obj.save()
+            self.assertEqual((obj.immutable_fingerprint, 'Obi-Wan'), model.objects.values_list('fingerprint', 'name').get())
+            obj.name = 'Yoda'
+            with self.assertNumQueries(1):
+                obj.save()
+
+    def test07_kept_on_the_instance_without_a_field(self):
+        obj = self.create(SimpleLockField, is_locked=True)
+        fingerprinted = obj.immutable_fingerprint
+        self.assertEqual(fingerprinted, obj.__dict__['_immutable_fingerprint'])
+        self.assertEqual(fingerprinted, pickle.loads(pickle.dumps(obj)).immutable_fingerprint)
+
+    def test08_alike_however_locked(self):
+        import datetime
+        from decimal import Decimal
+        from django.utils import timezone
+        issued = datetime.datetime(2015, 5, 4, 12, 30)
+        values = dict(amount=Decimal('1.1'), quantity='2', issued=issued)
+        saved = InvoicedFingerprinted(is_locked=True, **values)
+        saved.save()
+        bulk = InvoicedFingerprinted.objects.create(**values)
+        InvoicedFingerprinted.objects.filter(pk=bulk.pk).lock()
+        expected = saved.immutable_fingerprint
+        self.assertEqual(expected, InvoicedFingerprinted.objects.get(pk=saved.pk).immutable_fingerprint)
+        self.assertEqual(expected, InvoicedFingerprinted.objects.get(pk=bulk.pk).fingerprint)
+        with self.settings(USE_TZ=True, TIME_ZONE='Europe/Madrid'):
+            utc = timezone.make_aware(issued, timezone.get_default_timezone()).astimezone(timezone.utc)
+            self.assertEqual(fingerprint(InvoicedFingerprinted, [Decimal('1.10'), utc, 2]),
+                             fingerprint(InvoicedFingerprinted, [Decimal('1.1'), issued, 2]))
+
+
+class Case29_ImmutableCachedPropertyTest(TestCase):
+    def setUp(self):
+        self.obj = PricedLockField.objects.create(quantity=3, unit_price=10, is_locked=True)
+
+    def test01_cached_once_immutable(self):
+        self.assertEqual(30, self.obj.total)
+        self.assertEqual(30, self.obj.total)
+        self.assertEqual(1, self.obj._computed)
+        self.assertEqual(30, PricedLockField.objects.get().total)
+
+    def test02_never_cached_while_unlocked(self):
+        obj = PricedLockField(quantity=3, unit_price=10)
+        self.assertEqual(30, obj.total)
+        obj.quantity = 4
+        self.assertEqual(40, obj.total)
+        self.assertEqual(2, obj._computed)
+
+    def test03_forgotten_when_what_it_depends_on_changes(self):
+        self.assertEqual(30, self.obj.total)
+        self.obj.discount = 0
+        self.assertEqual(30, self.obj.total)
+        self.assertEqual(1, self.obj._computed)
+        self.obj.discount = 5
+        self.assertEqual(25, self.obj.total)
+        self.assertEqual(2, self.obj._computed)
+        # values blocked from changing make no difference
+        self.obj.quantity = 100
+        self.assertEqual(25, self.obj.total)
+        self.assertEqual(2, self.obj._computed)
+
+    def test04_forgotten_when_unlocked(self):
+        self.assertEqual((30, 30), (self.obj.total, self.obj.gross))
+        self.obj.is_locked = False
+        self.obj.quantity = 4
+        self.assertEqual((40, 40), (self.obj.total, self.obj.gross))
+        self.obj.refresh_from_db()
+        self.assertEqual((30, 30), (self.obj.total, self.obj.gross))
+
+    def test05_only_persisted_values_are_pickled(self):
+        self.assertEqual((30, 30), (self.obj.total, self.obj.gross))
+        for obj in (self.obj, PricedLockField.objects.defer('discount').get()):
+            obj.total, obj.gross
+            unpickled = pickle.loads(pickle.dumps(obj))
+            self.assertEqual(30, unpickled.__dict__['gross'])
+            self.assertFalse('total' in unpickled.__dict__)
+            self.assertEqual(30, unpickled.total)
+        self.assertTrue('total' in self.obj.__dict__)
@@ -0,0 +1,100 @@
+# encoding: utf-8
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse, Http404
+from django.test import TestCase
+from django.test.client import RequestFactory
+from django.views.generic import DetailView
+
+from immutablemodel.views import cache_if_locked, locked_etag, CacheIfLockedMixin
+
+from .testapp.models import SimpleLockField, FingerprintedLockField
+
+
+@cache_if_locked(SimpleLockField)
+def ship(request, pk):
+    if request.META.get('HTTP_AUTHORIZATION') == 'nobody':
+        raise PermissionDenied
+    try:
+        return HttpResponse(str(SimpleLockField.objects.get(pk=pk).special_id))
+    except SimpleLockField.DoesNotExist:
+        raise Http404
+
+
+@cache_if_locked(SimpleLockField, public=True)
+def public_ship(request, pk):
+    return HttpResponse(str(SimpleLockField.objects.get(pk=pk).special_id))
+
+
+class ShipView(CacheIfLockedMixin, DetailView):
+    model = FingerprintedLockField
+    immutable_max_age = 60
+
+    def get_queryset(self):
+        return super(ShipView, self).get_queryset().exclude(special_id=1337)
+
+    def render_to_response(self, context):
+        return HttpResponse(str(self.object.special_id))
+
+
+def cache_control(response):
+    return set(response['Cache-Control'].split(', '))
+
+
+class Case01_CacheIfLockedTest(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.locked = SimpleLockField.objects.create(special_id=1, name='Yoda', is_locked=True)
+        self.unlocked = SimpleLockField.objects.create(special_id=2, name='Yoda', is_locked=False)
+
+    def test01_locked_objects_are_cached_for_good(self):
+        response = ship(self.factory.get('/'), pk=self.locked.pk)
+        self.assertEqual(b'1', response.content)
+        self.assertEqual('"%s"' % self.locked.immutable_fingerprint, response['ETag'])
+        self.assertEqual(set(['private', 'max-age=31536000', 'immutable']), cache_control(response))
+        response = public_ship(self.factory.get('/'), pk=self.locked.pk)
+        self.assertEqual(set(['public', 'max-age=31536000', 'immutable']), cache_control(response))
+
+    def test02_if_none_match_answered_with_not_modified(self):
+        etag = ship(self.factory.get('/'), pk=self.locked.pk)['ETag']
+        response = ship(self.factory.get('/', HTTP_IF_NONE_MATCH='"other", %s' % etag), pk=self.locked.pk)
+        self.assertEqual(304, response.status_code)
+        self.assertEqual(b'', response.content)
+        self.assertEqual(etag, response['ETag'])
+        response = ship(self.factory.get('/', HTTP_IF_NONE_MATCH='"other"'), pk=self.locked.pk)
+        self.assertEqual(200, response.status_code)
+
+    def test03_unlocked_objects_are_left_to_the_view(self):
+        response = ship(self.factory.get('/', HTTP_IF_NONE_MATCH='*'), pk=self.unlocked.pk)
+        self.assertEqual(b'2', response.content)
+        self.assertFalse(response.has_header('ETag'))
+        self.assertFalse(response.has_header('Cache-Control'))
+        self.assertRaises(Http404, ship, self.factory.get('/'), pk=1337)
+        response = ship(self.factory.post('/'), pk=self.locked.pk)
+        self.assertFalse(response.has_header('ETag'))
+
+    def test04_the_view_checks_permissions_first(self):
+        etag = ship(self.factory.get('/'), pk=self.locked.pk)['ETag']
+        for if_none_match in ('*', etag):
+            self.assertRaises(PermissionDenied, ship, self.factory.get(
+                '/', HTTP_IF_NONE_MATCH=if_none_match, HTTP_AUTHORIZATION='nobody'), pk=self.locked.pk)
+
+    def test05_stored_fingerprint_and_class_based_views(self):
+        obj = FingerprintedLockField.objects.create(special_id=1, name='Yoda')
+        view = ShipView.as_view()
+        response = view(self.factory.get('/'), pk=obj.pk)
+        self.assertFalse(response.has_header('ETag'))
+        obj.is_locked = True
+        obj.save()
+        with self.assertNumQueries(1):
+            self.assertEqual('"%s"' % obj.fingerprint, locked_etag(FingerprintedLockField, pk=obj.pk))
+        response = view(self.factory.get('/'), pk=obj.pk)
+        self.assertEqual(b'1', response.content)
+        self.assertEqual(set(['private', 'max-age=60', 'immutable']), cache_control(response))
+        with self.assertNumQueries(1):
+            response = view(self.factory.get('/', HTTP_IF_NONE_MATCH=response['ETag']), pk=obj.pk)
+        self.assertEqual(304, response.status_code)
+
+    def test06_class_based_views_find_the_object_first(self):
+        obj = FingerprintedLockField.objects.create(special_id=1337, name='Yoda', is_locked=True)
+        view = ShipView.as_view()
+        self.assertRaises(Http404, view, self.factory.get('/', HTTP_IF_NONE_MATCH='*'), pk=obj.pk)
@@ -0,0 +1,23 @@
+from django import forms
+from django.contrib import admin
+from immutablemodel.admin import ImmutableModelAdmin, ComplexImmutableModelAdmin
+
+from .models import SimpleLockField, NotDeletableLockField, ComplexAdminModel
+
+
+class ComplexAdminModelForm(forms.ModelForm):
+    immutable_lock = forms.BooleanField(required=False)
+
+    class Meta:
+        model = ComplexAdminModel
+        fields = ('name', 'references')
+
+
+class ComplexAdminModelAdmin(ComplexImmutableModelAdmin):
+    form = ComplexAdminModelForm
+    fields = ('name', 'references', 'immutable_lock')
+
+
+admin.site.register(SimpleLockField, ImmutableModelAdmin)
+admin.site.register(NotDeletableLockField, ImmutableModelAdmin)
+admin.site.register(ComplexAdminModel, ComplexAdminModelAdmin)
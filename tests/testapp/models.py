@@ -1,5 +1,5 @@
 from django.db import models
-from immutablemodel import ImmutableModel
+from immutablemodel import ImmutableModel, immutable_cached_property
 
 class NoMeta(ImmutableModel):
     name = models.CharField(max_length=50)
@@ -117,3 +117,191 @@ class NoisyAbstractModelWithAttrs(AbstractModelWithAttrs):
 class NoisyInheritingModel(NoisyAbstractModelWithAttrs):
     child_field = models.CharField(max_length=50)
 
+
+
+class PlainLockField(models.Model):
+    """A plain django model mirroring ComplexLockField, used as a benchmark baseline"""
+    is_locked = models.BooleanField(default=True)
+    special_id = models.IntegerField()
+    name = models.CharField(max_length=50)
+
+
+class Reference(models.Model):
+    name = models.CharField(max_length=50)
+
+
+class HavingForeignKey(ImmutableModel):
+    reference = models.ForeignKey(Reference)
+    special_id = models.IntegerField()
+    name = models.CharField(max_length=50)
+
+    class Meta:
+        mutable_fields = ['name']
+
+
+class DescriptorLockField(ImmutableModel):
+    is_locked = models.BooleanField(default=False)
+    special_id = models.IntegerField()
+    name = models.CharField(max_length=50)
+    reference = models.ForeignKey(Reference, null=True)
+
+    class Meta:
+        immutable_fields = ['special_id', 'reference']
+        immutable_lock_field = 'is_locked'
+        immutable_descriptors = True
+
+
+class NoisyDescriptors(ImmutableModel):
+    special_id = models.IntegerField()
+
+    class Meta:
+        immutable_quiet = False
+        immutable_descriptors = True
+
+
+class HavingOwnManager(ImmutableModel):
+    name = models.CharField(max_length=50)
+
+    plain_objects = models.Manager()
+
+
+class NotDeletableLockField(ImmutableModel):
+    special_id = models.IntegerField()
+    is_locked = models.BooleanField(default=False)
+
+    class Meta:
+        immutable_fields = ['special_id']
+        immutable_lock_field = 'is_locked'
+        immutable_is_deletable = False
+
+
+class GuardedByDatabase(ImmutableModel):
+    special_id = models.IntegerField()
+    name = models.CharField(max_length=50)
+    is_locked = models.BooleanField(default=False)
+
+    class Meta:
+        immutable_fields = ['special_id']
+        immutable_lock_field = 'is_locked'
+        immutable_quiet = False
+        immutable_python_guard = False
+
+
+class ComplexAdminModel(ImmutableModel):
+    name = models.CharField(max_length=50)
+    is_locked = models.BooleanField(default=False)
+    references = models.ManyToManyField(Reference)
+
+    class Meta:
+        immutable_lock_field = 'is_locked'
+
+
+class CachedLockField(ImmutableModel):
+    special_id = models.IntegerField()
+    name = models.CharField(max_length=50)
+    is_locked = models.BooleanField(default=False)
+
+    class Meta:
+        immutable_fields = ['special_id']
+        immutable_lock_field = 'is_locked'
+        immutable_cache_instances = True
+
+
+class NoisyCached(ImmutableModel):
+    special_id = models.IntegerField()
+    reference = models.ForeignKey(Reference, null=True)
+
+    class Meta:
+        immutable_quiet = False
+        immutable_cache_instances = True
+
+
+class LoadCountingCached(ImmutableModel):
+    special_id = models.IntegerField()
+
+    loaded = 0
+
+    class Meta:
+        immutable_cache_instances = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        cls.loaded += 1
+        return super(LoadCountingCached, cls).from_db(db, field_names, values)
+
+
+class FingerprintedLockField(ImmutableModel):
+    special_id = models.IntegerField()
+    label = models.CharField(max_length=50, null=True)
+    name = models.CharField(max_length=50)
+    is_locked = models.BooleanField(default=False)
+    fingerprint = models.CharField(max_length=40, blank=True)
+
+    class Meta:
+        mutable_fields = ['name', 'is_locked']
+        immutable_lock_field = 'is_locked'
+        immutable_fingerprint_field = 'fingerprint'
+
+
+class InvoicedFingerprinted(ImmutableModel):
+    amount = models.DecimalField(max_digits=6, decimal_places=2)
+    issued = models.DateTimeField(null=True)
+    quantity = models.IntegerField(default=1)
+    is_locked = models.BooleanField(default=False)
+    fingerprint = models.CharField(max_length=40, blank=True)
+
+    class Meta:
+        mutable_fields = ['is_locked']
+        immutable_lock_field = 'is_locked'
+        immutable_fingerprint_field = 'fingerprint'
+
+
+class NoisyFingerprinted(ImmutableModel):
+    special_id = models.IntegerField()
+    label = models.CharField(max_length=50, blank=True)
+    name = models.CharField(max_length=50)
+    is_locked = models.BooleanField(default=False)
+    fingerprint = models.CharField(max_length=40, blank=True)
+
+    class Meta:
+        mutable_fields = ['name', 'is_locked']
+        immutable_lock_field = 'is_locked'
+        immutable_fingerprint_field = 'fingerprint'
+        immutable_quiet = False
+
+
+class PricedLockField(ImmutableModel):
+    quantity = models.IntegerField()
+    unit_price = models.IntegerField()
+    discount = models.IntegerField(default=0)
+    is_locked = models.BooleanField(default=False)
+
+    class Meta:
+        mutable_fields = ['discount', 'is_locked']
+        immutable_lock_field = 'is_locked'
+
+    @immutable_cached_property('discount')
+    def total(self):
+        self._computed = getattr(self, '_computed', 0) + 1
+        return self.quantity * self.unit_price - self.discount
+
+    @immutable_cached_property(persist=True)
+    def gross(self):
+        return self.quantity * self.unit_price
+
+
+class LockedParent(ImmutableModel):
+    special_id = models.IntegerField()
+    is_locked = models.BooleanField(default=False)
+
+    class Meta:
+        mutable_fields = ['is_locked']
+        immutable_lock_field = 'is_locked'
+
+
+class LockedChild(LockedParent):
+    code = models.IntegerField()
+
+    class Meta:
+        mutable_fields = ['is_locked']
+        immutable_lock_field = 'is_locked'